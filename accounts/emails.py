@@ -1,4 +1,4 @@
-from django.core.mail import send_mail
+from core.outbox import queue_mail
 from django.conf import settings
 from django.urls import reverse
 
@@ -12,4 +12,4 @@ def send_verification_email(to_email, token, request=None):
     subject = "Verify Your Email | JJ HALAL FARMS"
     message = f"Hello,\n\nPlease click the link below to verify your email:\n\n{verification_link}\n\nThank you!"
     from_email = settings.DEFAULT_FROM_EMAIL
-    send_mail(subject, message, from_email, [to_email])
+    queue_mail(subject, message, from_email, [to_email])
@@ -1,3 +1,49 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from orders.cart import cart_lines
+from orders.models import Cart, CartItem
+from products.models import Product
 
-# Create your tests here.
+
+class CartMergeOnLoginTests(TestCase):
+    def setUp(self):
+        self.hen = Product.objects.create(name="Hen", category="Poultry", price=10, stock=20)
+        self.ram = Product.objects.create(name="Ram", category="Cattle", price=100, stock=5)
+        self.customer = User.objects.create_user("buyer@example.com", password="x")
+        saved = Cart.objects.create(user=self.customer)
+        CartItem.objects.create(cart=saved, product=self.hen, quantity=2)
+
+    def add_as_guest(self, product, quantity):
+        self.client.post(reverse("orders:add_to_cart", args=[product.pk]), {"quantity": quantity})
+
+    def test_guest_cart_is_added_to_the_saved_cart(self):
+        self.add_as_guest(self.hen, 3)
+        self.add_as_guest(self.ram, 1)
+        self.client.force_login(self.customer)
+
+        cart = Cart.objects.get(user=self.customer)
+        self.assertEqual(cart_lines(cart), {self.hen.pk: 5, self.ram.pk: 1})
+        self.assertEqual(cart.item_count, 6)
+        self.assertFalse(Cart.objects.filter(user__isnull=True).exists())
+
+    def test_staff_login_leaves_the_guest_cart_alone(self):
+        self.add_as_guest(self.hen, 1)
+        self.client.force_login(User.objects.create_user("staff", password="x", is_staff=True))
+        self.assertTrue(Cart.objects.filter(user__isnull=True).exists())
+        self.assertFalse(Cart.objects.filter(user__is_staff=True).exists())
+
+    def test_merged_quantities_are_capped_at_stock(self):
+        CartItem.objects.create(cart=Cart.objects.get(user=self.customer), product=self.ram, quantity=4)
+        self.add_as_guest(self.ram, 3)
+        self.client.force_login(self.customer)
+        self.assertEqual(cart_lines(Cart.objects.get(user=self.customer))[self.ram.pk], 5)
+
+    def test_legacy_session_cart_skips_deleted_products(self):
+        session = self.client.session
+        session["cart"] = {"999": 1, str(self.ram.pk): 1, str(self.hen.pk): 0}
+        session.save()
+        self.client.force_login(self.customer)
+
+        cart = Cart.objects.get(user=self.customer)
+        self.assertEqual(cart_lines(cart), {self.hen.pk: 2, self.ram.pk: 1})
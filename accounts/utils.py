@@ -1,4 +1,4 @@
-from django.core.mail import send_mail
+from core.outbox import queue_mail
 from django.conf import settings
 from django.urls import reverse
 
@@ -10,10 +10,9 @@ def send_verification_email(email, token, request=None):
     else:
         verification_link = f"http://127.0.0.1:8000/auth{path}"
 
-    send_mail(
+    queue_mail(
         subject="Verify your JJ Halal Farms account",
         message=f"Click the link below to verify your account:\n{verification_link}",
         from_email=settings.DEFAULT_FROM_EMAIL,
         recipient_list=[email],
-        fail_silently=False,
     )
@@ -6,7 +6,7 @@ from django.contrib.auth.models import User
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.utils.encoding import force_str, force_bytes
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
+from core.outbox import queue_mail
 from django.conf import settings
 from django.urls import reverse
 from django.contrib.auth.hashers import make_password
@@ -142,7 +142,7 @@ def password_reset_request(request):
             reverse("accounts:password_reset_confirm", args=[uid, token])
         )
 
-        send_mail(
+        queue_mail(
             "Password Reset",
             f"Click the link to reset your password:\n{reset_link}",
             settings.DEFAULT_FROM_EMAIL,
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-17 21:05
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='adminprofile',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.content_storage, upload_to='admin_avatars/'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import User
 from django.db import models
+from core.storage import content_storage
 import uuid
 
 class AdminProfile(models.Model):
@@ -8,7 +9,7 @@ class AdminProfile(models.Model):
     phone = models.CharField(max_length=20, blank=True)
     location = models.CharField(max_length=150, blank=True)
     description = models.TextField(blank=True)
-    avatar = models.ImageField(upload_to="admin_avatars/", blank=True, null=True)
+    avatar = models.ImageField(upload_to="admin_avatars/", storage=content_storage, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -1,3 +1,43 @@
+from unittest import mock
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from orders.models import Order, OrderItem, StockReservation
+from products.models import Product
 
-# Create your tests here.
+
+class BulkOrderActionTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("staff", password="x", is_staff=True))
+        self.customer = User.objects.create(username="buyer@example.com")
+        self.ram = Product.objects.create(name="Ram", category="Cattle", price=100, stock=3)
+
+    def add_order(self, status, quantity):
+        order = Order.objects.create(user=self.customer, status=status, total_amount=100 * quantity)
+        OrderItem.objects.create(order=order, product=self.ram, quantity=quantity, price=100)
+        return order
+
+    def bulk(self, action, orders):
+        return self.client.post(
+            reverse("admin_panel:bulk_update_orders"),
+            {"action": action, "order_ids": [order.pk for order in orders]},
+        )
+
+    def test_failed_orders_get_their_stock_held_again(self):
+        held, short = self.add_order("failed", 2), self.add_order("failed", 2)
+        self.bulk("await_payment", [held, short])
+
+        self.assertEqual(Order.objects.get(pk=held.pk).status, "awaiting_payment")
+        self.assertEqual(Order.objects.get(pk=short.pk).status, "failed")
+        self.assertEqual(
+            list(StockReservation.objects.filter(status="active").values_list("order_id", "quantity")),
+            [(held.pk, 2)],
+        )
+
+    def test_a_failed_deduction_rolls_the_status_change_back(self):
+        order = self.add_order("pending", 1)
+        with mock.patch("admin_panel.views.deduct_stock_for_orders", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.bulk("complete", [order])
+        self.assertEqual(Order.objects.get(pk=order.pk).status, "pending")
+        self.assertFalse(order.status_history.exists())
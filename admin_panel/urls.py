@@ -10,8 +10,13 @@ urlpatterns = [
     path("logout/", views.admin_logout, name="logout"),
     path("customers/", views.admin_customers, name="customers"),
     path("orders/", views.admin_orders, name="orders"),
+    path("orders/export/", views.export_orders, name="export_orders"),
+    path("orders/bulk/", views.bulk_update_orders, name="bulk_update_orders"),
+    path("orders/pick-list/", views.admin_pick_list, name="pick_list"),
+    path("orders/packing-sheets/", views.admin_packing_sheets, name="packing_sheets"),
     path("orders/<int:pk>/status/", views.update_order_status, name="update_order_status"),
     path("orders/<int:pk>/", views.admin_order_detail, name="order_detail"),
+    path("analytics/", views.admin_analytics, name="analytics"),
     path("products/", views.admin_products, name="products"),
     path("customers/<int:pk>/", views.customer_detail, name="customer_detail"),
     path("customers/<int:pk>/toggle-status/", views.toggle_customer_status, name="toggle_customer_status"),
@@ -1,13 +1,29 @@
+from datetime import datetime, time, timedelta
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import StreamingHttpResponse
 from django.contrib.auth import authenticate, login, logout, get_user_model
 from django.contrib import messages
 from django.contrib.auth.models import User
+from products.catalog import ADMIN_PRODUCTS_PER_PAGE, catalog_context
 from products.models import Product
+from orders.analytics import PERIODS, load_snapshot, summarize, top_products
+from orders.export import EXPORT_FORMATS, export_filename, export_stream
+from orders.metrics import dashboard_metrics
+from orders.picking import orders_to_pick, packing_sheets, pick_list
 from orders.models import Order
+from orders.reservations import release_reservations, reserve_stock_for_orders
+from orders.stock import deduct_stock, deduct_stock_for_orders
+from orders.transitions import can_transition, source_statuses, transition_order, transition_orders
 from .models import AdminProfile
 from .decorators import staff_required
+from django.db import transaction
 from django.db.models import Q, Count, Sum
 from django.core.paginator import Paginator
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import url_has_allowed_host_and_scheme
+from core.images import schedule_derivatives
+from core.pagination import estimated_count, keyset_page
 from accounts.models import CustomerMessage
 
 User = get_user_model()
@@ -68,22 +84,19 @@ def admin_dashboard(request):
 
     context = {
         'total_products': Product.objects.count(),
-        'total_orders': Order.objects.count(),
-        'pending_orders': Order.objects.filter(status="pending").count(),
-        'completed_orders': Order.objects.filter(status="completed").count(),
         'recent_orders': recent_orders,
     }
+    # Order counts, revenue and trends come from the daily rollups, so the
+    # cost of this page does not grow with the number of orders.
+    context.update(dashboard_metrics())
     return render(request, 'admin_panel/dashboard.html', context)
 
 # ---------------- Admin Products ----------------
 @staff_required
 def admin_products(request):
-    """Admin product list."""
-    # Replace placeholder with real Product objects later
-    products = Product.objects.all()
-    context = {
-        "products": products,
-    }
+    """Admin product list, one category and cursor page at a time."""
+    products = Product.objects.only("name", "category", "price", "stock", "created_at")
+    context = catalog_context(products, request.GET, ADMIN_PRODUCTS_PER_PAGE)
     return render(request, 'admin_panel/products.html', context)
 
 
@@ -187,22 +200,146 @@ def customer_detail(request, pk):
 
 
 # ---------------- Admin Orders ----------------
+ORDERS_PER_PAGE = 10
+ORDER_LIST_ORDERING = ("-created_at", "-id")
+
+
+def _day_start(value):
+    day = parse_date(value or "")
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _filter_orders(queryset, params):
+    """
+    Apply the order list filters from ``params``.
+
+    Status and delivery method each have a (column, created_at, id) index,
+    the reference is unique and dates are a range on the keyset itself, so
+    any one filter combines with the (created_at, id) keyset without a sort.
+    """
+    filters = {
+        "status": params.get("status", ""),
+        "delivery_method": params.get("delivery_method", ""),
+        "reference": params.get("reference", "").strip(),
+        "date_from": params.get("date_from", ""),
+        "date_to": params.get("date_to", ""),
+    }
+    if filters["status"] in dict(Order.STATUS_CHOICES):
+        queryset = queryset.filter(status=filters["status"])
+    if filters["delivery_method"] in dict(Order.DELIVERY_CHOICES):
+        queryset = queryset.filter(delivery_method=filters["delivery_method"])
+    if filters["reference"]:
+        queryset = queryset.filter(payment_reference=filters["reference"])
+    date_from = _day_start(filters["date_from"])
+    if date_from:
+        queryset = queryset.filter(created_at__gte=date_from)
+    date_to = _day_start(filters["date_to"])
+    if date_to:
+        queryset = queryset.filter(created_at__lt=date_to + timedelta(days=1))
+    return queryset, filters
+
+
+def _page_query(params, **cursor):
+    query = params.copy()
+    for key in ("after", "before"):
+        query.pop(key, None)
+    query.update(cursor)
+    return query.urlencode()
+
+
 @staff_required
 def admin_orders(request):
-    """Admin orders overview."""
-    orders_list = (
-        Order.objects.select_related("user")
-        .prefetch_related("items__product")
-        .order_by("-created_at")
-        .distinct()
+    """Admin orders overview, paged by (created_at, id) cursor."""
+    orders_list, filters = _filter_orders(Order.objects.all(), request.GET)
+    orders = keyset_page(
+        orders_list.select_related("user").prefetch_related("items__product"),
+        ORDER_LIST_ORDERING,
+        ORDERS_PER_PAGE,
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
     )
-    paginator = Paginator(orders_list, 10)
-    page_number = request.GET.get("page")
-    orders = paginator.get_page(page_number)
-    return render(
-        request,
-        "admin_panel/orders.html",
-        {"orders": orders, "status_choices": Order.STATUS_CHOICES},
+    context = {
+        "orders": orders,
+        "filters": filters,
+        "estimated_total": estimated_count(orders_list),
+        "status_choices": Order.STATUS_CHOICES,
+        "delivery_choices": Order.DELIVERY_CHOICES,
+        "filter_query": _page_query(request.GET),
+    }
+    if orders.has_next:
+        context["next_query"] = _page_query(request.GET, after=orders.next_cursor)
+    if orders.has_previous:
+        context["previous_query"] = _page_query(request.GET, before=orders.previous_cursor)
+    return render(request, "admin_panel/orders.html", context)
+
+
+@staff_required
+def export_orders(request):
+    """Stream the filtered order list as CSV or JSON lines, optionally gzipped."""
+    export_format = request.GET.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        export_format = "csv"
+    compress = request.GET.get("gzip") == "1"
+    orders, _ = _filter_orders(Order.objects.all(), request.GET)
+    response = StreamingHttpResponse(
+        export_stream(orders, export_format, compress=compress),
+        content_type="application/gzip" if compress else EXPORT_FORMATS[export_format],
+    )
+    filename = export_filename(export_format, compress=compress)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _pick_selection(params):
+    """The pick list selection from ``params``: a day (today by default), delivery and status."""
+    day = parse_date(params.get("date", "")) or timezone.localdate()
+    delivery_method = params.get("delivery_method", "")
+    if delivery_method not in dict(Order.DELIVERY_CHOICES):
+        delivery_method = ""
+    status = params.get("status", "")
+    if status not in dict(Order.STATUS_CHOICES):
+        status = ""
+    return day, delivery_method, status
+
+
+@staff_required
+def admin_pick_list(request):
+    """Quantities to pick per product for a day's orders."""
+    day, delivery_method, status = _pick_selection(request.GET)
+    orders = orders_to_pick(day, delivery_method, status)
+    query = request.GET.copy()
+    query["date"] = day.isoformat()
+    context = {
+        "rows": pick_list(orders),
+        "order_count": orders.count(),
+        "day": day,
+        "delivery_method": delivery_method,
+        "status": status,
+        "status_choices": Order.STATUS_CHOICES,
+        "delivery_choices": Order.DELIVERY_CHOICES,
+        "selection_query": query.urlencode(),
+    }
+    return render(request, "admin_panel/pick_list.html", context)
+
+
+@staff_required
+def admin_packing_sheets(request):
+    """The pick list and a printable sheet per order, streamed as one HTML page."""
+    day, delivery_method, status = _pick_selection(request.GET)
+    title = " / ".join(
+        part
+        for part in (
+            day.strftime("%a %d %b %Y"),
+            dict(Order.DELIVERY_CHOICES).get(delivery_method),
+            dict(Order.STATUS_CHOICES).get(status),
+        )
+        if part
+    )
+    return StreamingHttpResponse(
+        packing_sheets(orders_to_pick(day, delivery_method, status), title=title),
+        content_type="text/html; charset=utf-8",
     )
 
 
@@ -222,23 +359,155 @@ def update_order_status(request, pk):
     order = get_object_or_404(Order, pk=pk)
     new_status = request.POST.get("status")
     valid_statuses = {choice[0] for choice in Order.STATUS_CHOICES}
-    if new_status in valid_statuses:
-        order.status = new_status
-        order.save(update_fields=["status"])
-        if new_status == "completed" and not order.stock_deducted:
-            for item in order.items.select_related("product"):
-                product = item.product
-                product.stock = max(product.stock - item.quantity, 0)
-                product.save(update_fields=["stock"])
-            order.stock_deducted = True
-            order.save(update_fields=["stock_deducted"])
-        messages.success(request, "Order status updated.")
-    else:
+    if new_status not in valid_statuses:
         messages.error(request, "Invalid status.")
+    elif new_status == order.status:
+        messages.info(request, "Order status unchanged.")
+    elif not can_transition(order.status, new_status):
+        messages.error(
+            request,
+            f"A {order.get_status_display().lower()} order cannot be marked "
+            f"{dict(Order.STATUS_CHOICES)[new_status].lower()}.",
+        )
+    else:
+        _update_order_status(request, order, new_status)
     return redirect("admin_panel:orders")
 
 
+def _update_order_status(request, order, new_status):
+    with transaction.atomic():
+        if new_status == "awaiting_payment":
+            shortfalls = reserve_stock_for_orders(Order.objects.filter(pk=order.pk))
+            if shortfalls:
+                messages.error(request, f"Cannot hold the stock again: {_shortfall_text(shortfalls)}.")
+                return
+        if not transition_order(order, new_status, source="admin", changed_by=request.user):
+            transaction.set_rollback(True)
+            messages.error(request, "The order was updated by someone else. Please try again.")
+            return
+        if new_status == "completed" and not order.stock_deducted:
+            shortfalls = deduct_stock(order)
+            if shortfalls:
+                messages.warning(request, f"Insufficient stock for: {_shortfall_text(shortfalls)}.")
+        elif new_status in ("failed", "cancelled"):
+            release_reservations([order.pk])
+    messages.success(request, "Order status updated.")
+
+
+BULK_ORDER_ACTIONS = {
+    "complete": "completed",
+    "cancel": "cancelled",
+    "await_payment": "awaiting_payment",
+}
+
+
+def _shortfall_text(shortfalls):
+    return ", ".join(
+        f"{line['product'].name} for order #{line['order_id']} "
+        f"(needed {line['requested']}, had {line['available']})"
+        for line in shortfalls
+    )
+
 
+@staff_required
+def bulk_update_orders(request):
+    """
+    Apply one status change to every selected order.
+
+    The legal orders move with a single UPDATE through ``transition_orders``
+    and newly completed ones have their stock taken in one aggregated
+    decrement, all in one transaction; the rest are reported as skipped, by
+    their current status. Failed orders put back to awaiting payment get
+    their stock held again first and are skipped if it is no longer there.
+    """
+    if request.method != "POST":
+        return redirect("admin_panel:orders")
+    next_url = request.POST.get("next")
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = None
+    new_status = BULK_ORDER_ACTIONS.get(request.POST.get("action"))
+    order_ids = {int(value) for value in request.POST.getlist("order_ids") if value.isdigit()}
+    if new_status is None:
+        messages.error(request, "Choose an action.")
+    elif not order_ids:
+        messages.error(request, "Select at least one order.")
+    else:
+        with transaction.atomic():
+            movable = order_ids
+            shortfalls = []
+            if new_status == "awaiting_payment":
+                # Orders whose stock cannot be held again stay where they are.
+                shortfalls = reserve_stock_for_orders(
+                    Order.objects.filter(pk__in=order_ids, status__in=source_statuses(new_status))
+                )
+                movable = order_ids - {line["order_id"] for line in shortfalls}
+            moved = transition_orders(
+                movable,
+                new_status,
+                source="admin_bulk",
+                changed_by=request.user,
+            )
+            if new_status == "completed":
+                shortfalls = deduct_stock_for_orders(moved)
+            elif new_status == "cancelled":
+                release_reservations(moved)
+
+        label = dict(Order.STATUS_CHOICES)[new_status].lower()
+        summary = f"{len(moved)} order{'s' if len(moved) != 1 else ''} marked {label}."
+        skipped = (
+            Order.objects.filter(pk__in=order_ids - set(moved))
+            .values("status")
+            .annotate(count=Count("id"))
+            .order_by("status")
+        )
+        skipped_text = ", ".join(
+            f"{row['count']} {dict(Order.STATUS_CHOICES).get(row['status'], row['status']).lower()}"
+            for row in skipped
+        )
+        if skipped_text:
+            summary += f" Skipped {skipped_text}."
+        messages.success(request, summary)
+        if shortfalls:
+            messages.warning(request, f"Insufficient stock for: {_shortfall_text(shortfalls)}.")
+    return redirect(next_url or "admin_panel:orders")
+
+
+# ---------------- Admin Analytics ----------------
+ANALYTICS_PERIOD_LIMITS = {"day": 30, "week": 26, "month": 24}
+
+
+@staff_required
+def admin_analytics(request):
+    """Sales trends from the precomputed analytics snapshot."""
+    period = request.GET.get("period", "day")
+    if period not in PERIODS:
+        period = "day"
+    snapshot = load_snapshot()
+    context = {"period": period, "periods": PERIODS, "snapshot": snapshot is not None}
+    if snapshot is not None:
+        summary = summarize(snapshot, period, limit=ANALYTICS_PERIOD_LIMITS[period])
+        best = top_products(snapshot)
+        names = dict(
+            Product.objects.filter(pk__in=[row[0] for row in best]).values_list("pk", "name")
+        )
+        context.update(
+            {
+                "rows": summary["rows"][::-1],
+                "categories": summary["categories"],
+                "chart": {
+                    "labels": summary["rolling_labels"],
+                    "rolling": summary["rolling"],
+                },
+                "top_products": [
+                    {"name": names.get(pk, f"#{pk}"), "units": units, "revenue": revenue}
+                    for pk, units, revenue in best
+                ],
+                "generated_at": datetime.fromtimestamp(
+                    float(snapshot["generated_at"]), tz=timezone.get_current_timezone()
+                ),
+            }
+        )
+    return render(request, "admin_panel/analytics.html", context)
 
 
 # ---------------- Admin Profile ----------------
@@ -260,9 +529,12 @@ def admin_profile(request):
         profile.phone = request.POST.get("phone", profile.phone)
         profile.location = request.POST.get("location", profile.location)
         profile.description = request.POST.get("description", profile.description)
-        if request.FILES.get("avatar"):
+        new_avatar = bool(request.FILES.get("avatar"))
+        if new_avatar:
             profile.avatar = request.FILES.get("avatar")
         profile.save()
+        if new_avatar:
+            schedule_derivatives(profile.avatar)
         messages.success(request, "Profile updated successfully.")
         return redirect("admin_panel:profile")
 
@@ -0,0 +1,165 @@
+"""
+Resized JPEG/PNG and WebP copies of uploaded images, for ``srcset``.
+
+Every upload gets one copy per width in ``IMAGE_WIDTHS`` and per format,
+stored next to the media files under ``derived/<original name>.<width>w``.
+The names only depend on the original's name, so templates can point at
+them without extra columns. Resizing runs in a process pool once the
+upload is committed; until it finishes pages keep using the original.
+"""
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from django.conf import settings
+from django.db import transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+IMAGE_WIDTHS = (320, 640, 1280)
+DERIVED_DIR = "derived"
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+ORIENTATION_TAG = 0x0112
+_PIL_FORMATS = {"jpg": "JPEG", "png": "PNG"}
+
+_pool = {"executor": None}
+
+
+def fallback_format(name):
+    """PNG for images that may be transparent, JPEG for everything else."""
+    return "png" if os.path.splitext(name)[1].lower() in (".png", ".gif") else "jpg"
+
+
+def derivative_name(name, width, extension):
+    stem = os.path.splitext(name)[0]
+    return f"{DERIVED_DIR}/{stem}.{width}w.{extension}"
+
+
+def derivative_names(name):
+    """``{(width, extension): name}`` for every copy of ``name``."""
+    return {
+        (width, extension): derivative_name(name, width, extension)
+        for width in IMAGE_WIDTHS
+        for extension in (fallback_format(name), "webp")
+    }
+
+
+def _save(image, path, extension):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=f".{extension}")
+    with os.fdopen(handle, "wb") as output:
+        if extension == "webp":
+            image.save(output, "WEBP", quality=WEBP_QUALITY, method=4)
+        elif extension == "png":
+            image.save(output, "PNG", optimize=True)
+        else:
+            if image.mode == "RGBA":
+                # JPEG has no alpha: transparent areas become white, not the
+                # colour hidden under them.
+                image = Image.alpha_composite(Image.new("RGBA", image.size, "white"), image)
+            image.convert("RGB").save(output, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    # Renamed into place so a page never links a half-written file.
+    os.replace(temp_path, path)
+
+
+def _copy(source_path, path):
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    os.close(handle)
+    shutil.copyfile(source_path, temp_path)
+    os.replace(temp_path, path)
+
+
+def render_derivatives(source_path, targets):
+    """
+    Write ``targets`` (``[(path, width, extension)]``) from one source image.
+
+    Runs in a worker process, so it only touches files. Each width is
+    scaled from the previous, larger one to keep the work down, and never
+    above the source size.
+    """
+    with Image.open(source_path) as source:
+        # Where no resize is needed an upright original in the same format
+        # is kept if it is smaller; re-encoding small JPEGs grows them.
+        reusable = source.getexif().get(ORIENTATION_TAG, 1) == 1 and source.format
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ("RGB", "RGBA"):
+            # LA, PA and palette or greyscale images with a transparent
+            # colour all keep their alpha as RGBA.
+            image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+        resized = False
+        for width in sorted({width for _, width, _ in targets}, reverse=True):
+            if image.width > width:
+                image = image.resize(
+                    (width, max(1, round(image.height * width / image.width))),
+                    Image.Resampling.LANCZOS,
+                )
+                resized = True
+            for path, target_width, extension in targets:
+                if target_width != width:
+                    continue
+                _save(image, path, extension)
+                if (
+                    not resized
+                    and reusable == _PIL_FORMATS.get(extension)
+                    and os.path.getsize(source_path) < os.path.getsize(path)
+                ):
+                    _copy(source_path, path)
+    return len(targets)
+
+
+def _executor():
+    if _pool["executor"] is None:
+        # Spawned, not forked, so workers do not inherit the web process's
+        # threads and database connections.
+        _pool["executor"] = ProcessPoolExecutor(
+            max_workers=getattr(settings, "IMAGE_WORKERS", 2),
+            mp_context=get_context("spawn"),
+        )
+    return _pool["executor"]
+
+
+def derivative_targets(field_file):
+    """``(path, width, extension)`` for every copy, as ``render_derivatives`` takes them."""
+    storage = field_file.storage
+    return [
+        (storage.path(name), width, extension)
+        for (width, extension), name in derivative_names(field_file.name).items()
+    ]
+
+
+def _finished(name, on_ready):
+    def done(future):
+        if future.exception() is not None:
+            logger.error("Could not resize %s: %s", name, future.exception())
+        elif on_ready is not None:
+            on_ready()
+    return done
+
+
+def schedule_derivatives(field_file, on_ready=None):
+    """
+    Have the process pool write the copies of ``field_file`` after commit.
+
+    ``on_ready`` is called (in this process) once they are all written,
+    e.g. to retire cached pages that still link the original.
+    """
+    if not field_file:
+        return
+    source, targets, name = field_file.path, derivative_targets(field_file), field_file.name
+
+    def submit():
+        future = _executor().submit(render_derivatives, source, targets)
+        future.add_done_callback(_finished(name, on_ready))
+
+    transaction.on_commit(submit)
+
+
+def derivatives_ready(field_file):
+    """Whether the smallest WebP copy, the last one written, exists."""
+    name = derivative_name(field_file.name, IMAGE_WIDTHS[0], "webp")
+    return field_file.storage.exists(name)
@@ -0,0 +1,47 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from admin_panel.models import AdminProfile
+from core.images import derivative_targets, derivatives_ready, render_derivatives
+from products.catalog import bump_catalog_version
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the resized JPEG/PNG and WebP copies of product images and "
+        "admin avatars that do not have them yet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Rebuild copies that already exist.")
+        parser.add_argument("--workers", type=int, default=getattr(settings, "IMAGE_WORKERS", 2))
+
+    def handle(self, *args, **options):
+        files = [product.image for product in Product.objects.exclude(image="").only("image")]
+        files += [profile.avatar for profile in AdminProfile.objects.exclude(avatar="").only("avatar")]
+        pending = {}
+        for field_file in files:
+            if not field_file or field_file.name in pending:
+                continue
+            if not os.path.exists(field_file.path):
+                self.stderr.write(f"Missing file: {field_file.name}")
+            elif options["force"] or not derivatives_ready(field_file):
+                pending[field_file.name] = field_file
+
+        built = failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            futures = {
+                pool.submit(render_derivatives, field_file.path, derivative_targets(field_file)): name
+                for name, field_file in pending.items()
+            }
+            for future in as_completed(futures):
+                if future.exception() is not None:
+                    failed += 1
+                    self.stderr.write(f"Could not resize {futures[future]}: {future.exception()}")
+                else:
+                    built += 1
+        if built:
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"Resized {built} image(s), {failed} failed."))
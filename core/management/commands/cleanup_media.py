@@ -0,0 +1,44 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.storage import content_storage, media_directories, media_references, stored_names
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete uploaded files, and their resized copies, that no product or "
+        "admin profile references any more (e.g. after a product is deleted)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="List the files without deleting them.")
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=60,
+            help="Minutes a file must be unchanged before it is deleted, so uploads still being saved are kept.",
+        )
+
+    def handle(self, *args, **options):
+        storage = content_storage()
+        references = media_references()
+        cutoff = timezone.now() - timedelta(minutes=options["min_age"])
+        orphaned = []
+        for directory in media_directories():
+            for name in stored_names(storage, directory):
+                if not references[name] and storage.get_modified_time(name) < cutoff:
+                    orphaned.append(name)
+
+        deleted = 0
+        for name in orphaned:
+            # An upload of the same bytes since the scan touched the file
+            # and is about to reference it.
+            if not storage.exists(name) or storage.get_modified_time(name) >= cutoff:
+                continue
+            if options["dry_run"]:
+                self.stdout.write(name)
+            else:
+                storage.delete(name)
+            deleted += 1
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {deleted} orphaned file(s)."))
@@ -0,0 +1,54 @@
+import os
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from core.storage import MEDIA_FIELDS, content_storage, is_content_addressed
+from products.catalog import bump_catalog_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Store uploads saved under their original names by content hash and "
+        "point their rows at the new names; identical files become one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            default=getattr(settings, "PROJECT_ROOT", os.getcwd()),
+            help="Where files missing from MEDIA_ROOT are looked up (uploads went to the project root before MEDIA_ROOT was set).",
+        )
+
+    def handle(self, *args, **options):
+        storage = content_storage()
+        stored = missing = 0
+        for label, field in MEDIA_FIELDS:
+            model = apps.get_model(label)
+            names = (
+                model.objects.exclude(**{field: ""})
+                .exclude(**{f"{field}__isnull": True})
+                .values_list(field, flat=True)
+                .distinct()
+            )
+            for name in names:
+                if is_content_addressed(name):
+                    continue
+                candidates = (storage.path(name), os.path.join(options["source"], name))
+                path = next((path for path in candidates if os.path.isfile(path)), None)
+                if path is None:
+                    missing += 1
+                    self.stderr.write(f"Missing file: {name}")
+                    continue
+                with open(path, "rb") as handle:
+                    new_name = storage.save(name, File(handle))
+                model.objects.filter(**{field: name}).update(**{field: new_name})
+                stored += 1
+        if stored:
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"Stored {stored} file(s) by content hash, {missing} missing."))
+        if stored:
+            self.stdout.write(
+                "Run build_image_derivatives for their resized copies, then "
+                "cleanup_media to delete the old names from MEDIA_ROOT."
+            )
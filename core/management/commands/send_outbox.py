@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from core.outbox import send_pending
+
+
+class Command(BaseCommand):
+    help = "Send queued outbound emails in batches over a reused SMTP connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new messages instead of exiting when the outbox is empty.",
+        )
+        parser.add_argument("--interval", type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        while True:
+            sent, retried, failed = send_pending(options["batch_size"])
+            if sent or retried or failed:
+                self.stdout.write(f"sent={sent} retried={retried} failed={failed}")
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
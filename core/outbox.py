@@ -0,0 +1,105 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .models import OutboundEmail
+
+
+def queue_mail(subject, message, from_email, recipient_list):
+    """Store an email for the outbox worker instead of sending it inline."""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+
+
+def _retry_delay(attempts):
+    base = getattr(settings, "EMAIL_OUTBOX_RETRY_DELAY", 60)
+    ceiling = getattr(settings, "EMAIL_OUTBOX_MAX_RETRY_DELAY", 3600)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), ceiling))
+
+
+def _claim_batch(batch_size, lease):
+    """
+    Reserve up to ``batch_size`` due messages for this worker.
+
+    Claimed rows have ``next_attempt_at`` pushed past the lease so other
+    workers skip them; if this worker dies they become due again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status="pending", next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if ids:
+            OutboundEmail.objects.filter(id__in=ids).update(next_attempt_at=now + lease)
+    return list(OutboundEmail.objects.filter(id__in=ids).order_by("id"))
+
+
+def send_pending(batch_size=100):
+    """
+    Deliver one batch of due messages over a single SMTP connection.
+
+    Returns a ``(sent, retried, failed)`` tuple.
+    """
+    max_attempts = getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+    lease = timedelta(seconds=getattr(settings, "EMAIL_OUTBOX_LEASE", 300))
+    batch = _claim_batch(batch_size, lease)
+    if not batch:
+        return 0, 0, 0
+
+    sent = retried = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+        connection_error = None
+    except Exception as exc:
+        connection_error = exc
+
+    for outbound in batch:
+        now = timezone.now()
+        outbound.attempts += 1
+        error = connection_error
+        if error is None:
+            try:
+                delivered = EmailMessage(
+                    outbound.subject,
+                    outbound.body,
+                    outbound.from_email,
+                    outbound.recipients,
+                    connection=connection,
+                ).send()
+            except Exception as exc:
+                error = exc
+            else:
+                # Backends report a message they silently dropped as 0 sent.
+                if not delivered:
+                    error = "The mail backend did not send the message."
+
+        if error is None:
+            outbound.status = "sent"
+            outbound.sent_at = now
+            outbound.last_error = ""
+            sent += 1
+        elif outbound.attempts >= max_attempts:
+            outbound.status = "failed"
+            outbound.last_error = str(error)
+            failed += 1
+        else:
+            outbound.next_attempt_at = now + _retry_delay(outbound.attempts)
+            outbound.last_error = str(error)
+            retried += 1
+
+    connection.close()
+
+    OutboundEmail.objects.bulk_update(
+        batch,
+        ["status", "attempts", "last_error", "next_attempt_at", "sent_at"],
+    )
+    return sent, retried, failed
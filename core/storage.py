@@ -0,0 +1,135 @@
+"""
+Upload storage that names each file after the SHA-256 of its bytes.
+
+``products/egg.jpg`` is stored as ``products/e0/e075c2...b52e23.jpg``.
+Uploading the same bytes again returns the existing name instead of
+writing a copy with a random suffix, and since a name can never point at
+other content, its URL (and those of its resized copies) can be cached
+for good. Files are removed by ``manage.py cleanup_media`` once no row
+references them, never when a row is deleted, as other rows may share them.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+from collections import Counter
+from django.apps import apps
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from .images import DERIVED_DIR, derivative_names
+
+# File fields kept in this storage; cleanup_media counts their references.
+MEDIA_FIELDS = (("products.Product", "image"), ("admin_panel.AdminProfile", "avatar"))
+
+# Name stem of content-addressed files and of their ``derived/`` copies.
+_HASHED_NAME = re.compile(r"(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\d+w)?\.\w+$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def is_content_addressed(name):
+    return bool(_HASHED_NAME.search(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """``FileSystemStorage`` keyed by content, under ``MEDIA_ROOT`` by default."""
+
+    def hashed_name(self, name, content):
+        """``<directory>/<first two hex digits>/<sha256>.<extension>``."""
+        digest = content_hash(content)
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(posixpath.dirname(name), digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # Touched so cleanup_media's age check spares a file that was
+            # orphaned until this upload and is not referenced yet.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # A file already under this name holds the same bytes, so the name
+        # is never changed to make room.
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(
+                f'Storage can not find an available filename for "{name}". '
+                "Please make sure that the corresponding file field "
+                'allows sufficient "max_length".'
+            )
+        return name
+
+    def _save(self, name, content):
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        try:
+            with os.fdopen(handle, "wb") as output:
+                for chunk in content.chunks():
+                    output.write(chunk)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            # Two uploads of the same bytes may race to this point; either
+            # copy is the same file.
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+
+_storage = ContentAddressedStorage()
+
+
+def content_storage():
+    """The shared instance; fields take this callable so migrations stay portable."""
+    return _storage
+
+
+def media_references():
+    """``Counter`` of the rows using each stored name, ``derived/`` copies included."""
+    references = Counter()
+    for label, field in MEDIA_FIELDS:
+        rows = apps.get_model(label).objects.exclude(**{field: ""}).exclude(**{f"{field}__isnull": True})
+        for name in rows.values_list(field, flat=True).iterator():
+            references[name] += 1
+    for name, count in list(references.items()):
+        for derived in derivative_names(name).values():
+            references[derived] += count
+    return references
+
+
+def media_directories():
+    """The upload directories of ``MEDIA_FIELDS`` and the resized copies'."""
+    directories = [
+        apps.get_model(label)._meta.get_field(field).upload_to.strip("/")
+        for label, field in MEDIA_FIELDS
+    ]
+    return directories + [DERIVED_DIR]
+
+
+def stored_names(storage, directory):
+    """Every file name under ``directory``, recursively."""
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for file_name in files:
+        yield posixpath.join(directory, file_name)
+    for subdirectory in directories:
+        yield from stored_names(storage, posixpath.join(directory, subdirectory))
@@ -0,0 +1,54 @@
+from django import template
+from django.utils.html import format_html
+from core.images import IMAGE_WIDTHS, derivative_names, derivatives_ready, fallback_format
+
+register = template.Library()
+
+
+def _srcset(field_file, extension):
+    names = derivative_names(field_file.name)
+    return ", ".join(
+        f"{field_file.storage.url(names[(width, extension)])} {width}w" for width in IMAGE_WIDTHS
+    )
+
+
+@register.filter
+def srcset(field_file, extension="webp"):
+    """``url 320w, url 640w, ...`` for an image's resized copies, or ``""`` until they exist."""
+    if not field_file or not derivatives_ready(field_file):
+        return ""
+    return _srcset(field_file, fallback_format(field_file.name) if extension == "fallback" else extension)
+
+
+@register.simple_tag
+def responsive_image(field_file, sizes="100vw", alt="", css_class="", default_width=640):
+    """
+    A ``<picture>`` offering the WebP copies, then JPEG/PNG ones, sized by ``sizes``.
+
+    Falls back to a plain ``<img>`` of the original while the copies are
+    still being made.
+    """
+    if not field_file:
+        return ""
+    if not derivatives_ready(field_file):
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+            field_file.url,
+            alt,
+            css_class,
+        )
+    extension = fallback_format(field_file.name)
+    width = min(IMAGE_WIDTHS, key=lambda candidate: abs(candidate - default_width))
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        _srcset(field_file, "webp"),
+        sizes,
+        field_file.storage.url(derivative_names(field_file.name)[(width, extension)]),
+        _srcset(field_file, extension),
+        sizes,
+        alt,
+        css_class,
+    )
@@ -1,3 +1,191 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.core.management import call_command
+from PIL import Image
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from products.models import Product
+from .images import derivative_names, derivative_targets, render_derivatives
+from .management.commands import cleanup_media
+from .models import OutboundEmail
+from .outbox import _claim_batch, queue_mail, send_pending
+from .storage import IMMUTABLE_CACHE_CONTROL
+from .views import media
 
-# Create your tests here.
+
+@override_settings(
+    EMAIL_OUTBOX_RETRY_DELAY=60,
+    EMAIL_OUTBOX_MAX_RETRY_DELAY=200,
+    EMAIL_OUTBOX_MAX_ATTEMPTS=4,
+    EMAIL_OUTBOX_LEASE=300,
+)
+class OutboxTests(TestCase):
+    def test_claimed_messages_are_leased_to_one_worker(self):
+        queue_mail("Welcome", "Hello", "", ["buyer@example.com"])
+        lease = timedelta(seconds=300)
+        self.assertEqual(len(_claim_batch(10, lease)), 1)
+        self.assertEqual(_claim_batch(10, lease), [])
+
+        # The worker died: the message is due again once the lease runs out.
+        with mock.patch("core.outbox.timezone.now", return_value=timezone.now() + lease * 2):
+            self.assertEqual(len(_claim_batch(10, lease)), 1)
+
+    def test_failed_sends_back_off_then_give_up(self):
+        outbound = queue_mail("Receipt", "Paid", "shop@example.com", ["buyer@example.com"])
+        delays = []
+        with mock.patch("django.core.mail.EmailMessage.send", side_effect=OSError("refused")):
+            for expected in ((0, 1, 0), (0, 1, 0), (0, 1, 0), (0, 0, 1)):
+                started = timezone.now()
+                self.assertEqual(send_pending(), expected)
+                outbound.refresh_from_db()
+                delays.append(round((outbound.next_attempt_at - started).total_seconds()))
+                OutboundEmail.objects.filter(pk=outbound.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(delays[:3], [60, 120, 200])
+        self.assertEqual((outbound.status, outbound.attempts, outbound.last_error), ("failed", 4, "refused"))
+        self.assertEqual(send_pending(), (0, 0, 0))
+
+    def test_message_the_backend_did_not_send_is_retried(self):
+        outbound = queue_mail("Receipt", "Paid", "shop@example.com", ["buyer@example.com"])
+        with mock.patch("django.core.mail.EmailMessage.send", return_value=0):
+            self.assertEqual(send_pending(), (0, 1, 0))
+        outbound.refresh_from_db()
+        self.assertEqual((outbound.status, outbound.attempts), ("pending", 1))
+        self.assertEqual(outbound.last_error, "The mail backend did not send the message.")
+
+
+class HomeCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(name="Hen", category="Poultry", price=10, stock=5)
+
+    def catalog_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/")
+        return response, [q for q in queries.captured_queries if "products_product" in q["sql"]]
+
+    def test_warm_home_page_skips_the_catalog_query(self):
+        self.catalog_queries()
+        response, queries = self.catalog_queries()
+        self.assertEqual(queries, [])
+        self.assertContains(response, "In stock: 5")
+        self.assertContains(response, 'name="csrfmiddlewaretoken"')
+
+    def test_product_edit_shows_up_right_away(self):
+        self.catalog_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.stock = 2
+            self.product.save()
+        response, queries = self.catalog_queries()
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, "In stock: 2")
+
+    def test_junk_parameters_share_the_first_page_entry(self):
+        self.catalog_queries()
+        for query in ("?after=junk", "?before=!!&sort=bogus", "?category=Nope&after=WzFd"):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get("/" + query)
+            self.assertFalse(
+                [q for q in queries.captured_queries if "products_product" in q["sql"]],
+                query,
+            )
+
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), MEDIA_URL="/media/")
+class ImageDerivativeTests(TestCase):
+    def test_copies_are_resized_and_offered_through_srcset(self):
+        photo = io.BytesIO()
+        Image.new("RGB", (3000, 2000), (180, 40, 40)).save(photo, "JPEG", quality=95)
+        product = Product.objects.create(
+            name="Hen",
+            category="Poultry",
+            price=10,
+            stock=1,
+            image=SimpleUploadedFile("hen.jpg", photo.getvalue()),
+        )
+        template = Template("{% load responsive_images %}{% responsive_image product.image %}")
+        self.assertNotIn("srcset", template.render(Context({"product": product})))
+
+        render_derivatives(product.image.path, derivative_targets(product.image))
+        small = product.image.storage.path(derivative_names(product.image.name)[(320, "webp")])
+        with Image.open(small) as image:
+            self.assertEqual(image.size, (320, 213))
+        self.assertLess(os.path.getsize(small) * 10, product.image.size)
+        html = template.render(Context({"product": product}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn(".320w.webp 320w", html)
+
+
+    def test_transparent_images_keep_alpha_in_webp_and_turn_white_in_jpeg(self):
+        directory = tempfile.mkdtemp()
+        source = os.path.join(directory, "logo.png")
+        Image.new("LA", (640, 320), (0, 0)).save(source)
+        jpeg, webp = os.path.join(directory, "logo.jpg"), os.path.join(directory, "logo.webp")
+        render_derivatives(source, [(jpeg, 320, "jpg"), (webp, 320, "webp")])
+        with Image.open(jpeg) as image:
+            self.assertGreater(min(image.getpixel((160, 80))), 250)
+        with Image.open(webp) as image:
+            self.assertEqual(image.mode, "RGBA")
+            self.assertEqual(image.getpixel((160, 80))[3], 0)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), MEDIA_URL="/media/")
+class ContentAddressedStorageTests(TestCase):
+    def add_product(self, file_name):
+        return Product.objects.create(
+            name="Eggs",
+            category="Poultry",
+            price=5,
+            stock=1,
+            image=SimpleUploadedFile(file_name, b"same eggs photo"),
+        )
+
+    def test_identical_uploads_share_one_immutable_file(self):
+        first, second = self.add_product("egg.jpg"), self.add_product("egg_again.JPG")
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r"^products/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$")
+
+        response = media(RequestFactory().get(first.image.url), first.image.name)
+        self.assertEqual(b"".join(response.streaming_content), b"same eggs photo")
+        self.assertEqual(response["Cache-Control"], IMMUTABLE_CACHE_CONTROL)
+
+    def test_cleanup_deletes_files_once_no_row_references_them(self):
+        first, second = self.add_product("egg.jpg"), self.add_product("egg.jpg")
+        storage, name = first.image.storage, first.image.name
+        old = (timezone.now() - timedelta(hours=2)).timestamp()
+        os.utime(storage.path(name), (old, old))
+
+        first.delete()
+        call_command("cleanup_media", stdout=io.StringIO())
+        self.assertTrue(storage.exists(name))
+
+        second.delete()
+        call_command("cleanup_media", stdout=io.StringIO())
+        self.assertFalse(storage.exists(name))
+
+    def test_cleanup_spares_a_file_reused_after_the_scan(self):
+        product = self.add_product("egg.jpg")
+        storage, name = product.image.storage, product.image.name
+        old = (timezone.now() - timedelta(hours=2)).timestamp()
+        os.utime(storage.path(name), (old, old))
+        product.delete()
+
+        scan = cleanup_media.stored_names
+
+        def scan_then_upload(storage, directory):
+            yield from scan(storage, directory)
+            if directory == "products":
+                self.add_product("egg.jpg")
+
+        with mock.patch.object(cleanup_media, "stored_names", scan_then_upload):
+            call_command("cleanup_media", stdout=io.StringIO())
+        self.assertTrue(storage.exists(name))
@@ -0,0 +1,6 @@
+def parse_int(value):
+    """``int(value)``, or ``None`` for missing and malformed input."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
@@ -1,12 +1,108 @@
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.functions import Left
+from django.middleware.csrf import get_token
 from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.views.static import serve
+from .pagination import decode_cursor
+from .storage import IMMUTABLE_CACHE_CONTROL, is_content_addressed
+from products.catalog import PRODUCT_SORTS, catalog_cache_key, catalog_context, catalog_filters
 from products.models import Product
+from products.search import search_products
+
+STOREFRONT_PER_PAGE = 12
+SEARCH_PER_PAGE = 12
+
+# Stands in for the per-visitor CSRF field inside the shared cached grid.
+_CSRF_PLACEHOLDER = "__csrf_input__"
+
+
+def _storefront_products():
+    """The columns a product card shows, with only the start of the description."""
+    return Product.objects.only(
+        "name", "category", "price", "stock", "image", "created_at"
+    ).annotate(summary=Left("description", 300))
+
+
+def _csrf_field(request):
+    return mark_safe(
+        f'<input type="hidden" name="csrfmiddlewaretoken" value="{get_token(request)}">'
+    )
+
+
+def _product_grid(request):
+    """
+    The rendered product grid, from the cache while the catalog is unchanged.
+
+    The grid is the same for every visitor apart from the CSRF field of its
+    add-to-cart forms, which is filled in per request. Each category, sort
+    and page is cached on its own; a miss loads one page of the columns the
+    cards show, with only the start of each description.
+    """
+    key = catalog_cache_key(f"product_grid:{_grid_selection(request.GET)}")
+    grid = cache.get(key)
+    if grid is None:
+        context = catalog_context(_storefront_products(), request.GET, STOREFRONT_PER_PAGE)
+        context["csrf_input"] = _CSRF_PLACEHOLDER
+        grid = render_to_string("core/product_grid.html", context)
+        cache.set(key, grid, getattr(settings, "CATALOG_CACHE_TIMEOUT", 24 * 60 * 60))
+    return mark_safe(grid.replace(_CSRF_PLACEHOLDER, _csrf_field(request)))
+
+
+def _grid_selection(params):
+    """
+    Digest of the grid page ``params`` ask for, after validation.
+
+    Unknown filters and malformed cursors render the same page as the
+    defaults, so they share its cache entry instead of each adding one.
+    """
+    filters = catalog_filters(params)
+    cursor = []
+    # keyset_page tries ``before`` first.
+    for name in ("before", "after"):
+        values = decode_cursor(params.get(name, ""))
+        if values is not None and len(values) == len(PRODUCT_SORTS[filters["sort"]]):
+            cursor = [name, values]
+            break
+    selection = json.dumps([filters["category"], filters["sort"], cursor], separators=(",", ":"))
+    return hashlib.md5(selection.encode("utf-8")).hexdigest()
 
 
 def home(request):
-    products = Product.objects.all()
     return render(request, "core/index.html", {
-        "products": products
+        "product_grid": _product_grid(request)
     })
 
+def search(request):
+    """Ranked product search, rendered in the storefront page."""
+    query = request.GET.get("q", "").strip()
+    results = search_products(
+        query,
+        request.GET.get("page"),
+        SEARCH_PER_PAGE,
+        queryset=_storefront_products(),
+    )
+    return render(request, "core/index.html", {
+        "query": query,
+        "searching": True,
+        "search_results": results,
+        "csrf_input": _csrf_field(request),
+    })
+
+def media(request, path):
+    """
+    An uploaded file, in development. Content-addressed names never change
+    content, so browsers may keep them for a year without revalidating; the
+    production web server sends the same header.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if is_content_addressed(path):
+        response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
+
 def index(request):
-    return render(request, "index.html")
\ No newline at end of file
+    return render(request, "index.html")
@@ -56,6 +56,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'accounts.apps.AccountsConfig',
     'django.contrib.humanize',
+    'django.contrib.postgres',
     'products',
     'core',
     "admin_panel.apps.AdminPanelConfig",
@@ -95,6 +96,11 @@ TEMPLATES = [
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# Uploads (product images, admin avatars), stored by content hash
+# (core/storage.py) and served with far-future cache headers.
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', os.path.join(PROJECT_ROOT, 'media'))
+
 # WSGI application
 WSGI_APPLICATION = 'jj_halal_farms.wsgi.application'
 
@@ -113,6 +119,26 @@ DATABASES = {
     }
 }
 
+# Cache
+# The storefront product grid is cached until a product changes (see
+# products/catalog.py). The file cache is shared by every worker on this
+# host; set REDIS_URL (needs the redis package) to share it across hosts.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(PROJECT_ROOT, 'var', 'cache'),
+        }
+    }
+CATALOG_CACHE_TIMEOUT = 24 * 60 * 60
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -157,9 +183,38 @@ EMAIL_HOST_USER = YOUR_EMAIL_ADDRESS
 EMAIL_HOST_PASSWORD = YOUR_EMAIL_PASSWORD
 DEFAULT_FROM_EMAIL = "JJ Halal Farms YOUR_EMAIL_ADDRESS"
 
+# Outbound email queue (sent by `manage.py send_outbox`)
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60
+EMAIL_OUTBOX_MAX_RETRY_DELAY = 3600
+EMAIL_OUTBOX_LEASE = 300
+
 # Paystack
 PAYSTACK_SECRET_KEY = os.getenv("PAYSTACK_SECRET_KEY", "")
 PAYSTACK_PUBLIC_KEY = os.getenv("PAYSTACK_PUBLIC_KEY", "")
+# Point at `manage.py paystack_simulator` to test payments offline.
+PAYSTACK_BASE_URL = os.getenv("PAYSTACK_BASE_URL", "https://api.paystack.co")
+PAYSTACK_CONNECT_TIMEOUT = 3.05
+PAYSTACK_READ_TIMEOUT = 10
+PAYSTACK_VERIFY_RETRIES = 2
+PAYSTACK_MAX_CONCURRENT = 10
+PAYSTACK_QUEUE_TIMEOUT = 2
+PAYSTACK_BREAKER_THRESHOLD = 5
+PAYSTACK_BREAKER_COOLDOWN = 30
+
+# Stock reservations (minutes an unpaid order holds its stock)
+STOCK_RESERVATION_TTL = 30
+STOCK_RESERVATION_TTL_PAY_ON_DELIVERY = 72 * 60
+
+# Sales analytics snapshot written by `manage.py build_sales_analytics` and
+# read by the admin analytics page (orders/analytics.py)
+ANALYTICS_SNAPSHOT_PATH = os.path.join(PROJECT_ROOT, 'var', 'analytics', 'sales.npz')
+
+# Processes resizing uploaded images into srcset copies (core/images.py)
+IMAGE_WORKERS = 2
+
+# Unpaid orders older than this are cancelled by `manage.py expire_stale_orders`
+STALE_ORDER_HOURS = 72
 
 # Admin notifications
 ADMIN_EMAIL = os.getenv("ADMIN_EMAIL", "")
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from core.views import media
 
 urlpatterns = [
     # CORE / PUBLIC
@@ -17,5 +18,6 @@ urlpatterns = [
     path("admin/orders/", include("orders.urls")),
 ]
 
+# In production the web server serves MEDIA_ROOT (see README, Serving Uploads).
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(settings.MEDIA_URL, view=media)
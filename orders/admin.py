@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import Order, OrderItem, OrderStatusChange
 
 
 class OrderItemInline(admin.TabularInline):
@@ -7,12 +7,24 @@ class OrderItemInline(admin.TabularInline):
     extra = 0
 
 
+class OrderStatusChangeInline(admin.TabularInline):
+    model = OrderStatusChange
+    extra = 0
+    can_delete = False
+    readonly_fields = ("from_status", "to_status", "version", "source", "changed_by", "created_at")
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "status", "total_amount", "created_at")
     list_filter = ("status", "created_at")
     search_fields = ("user__email", "user__username", "payment_reference")
-    inlines = [OrderItemInline]
+    # Status changes go through orders.transitions so they are recorded.
+    readonly_fields = ("status", "version")
+    inlines = [OrderItemInline, OrderStatusChangeInline]
 
 
 @admin.register(OrderItem)
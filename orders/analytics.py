@@ -0,0 +1,267 @@
+"""
+Sales analytics over the whole order history, computed with NumPy.
+
+``build_snapshot`` streams completed orders and their lines out of the
+database in id-keyed chunks of plain tuples, folds each chunk into
+fixed-size per-day, per-category and per-product arrays with
+``np.bincount`` and saves the result as an ``.npz`` file. Memory is
+bounded by the chunk size plus one slot per day and per product, never by
+the number of lines. The admin page only loads the snapshot and regroups
+the daily arrays by week or month.
+"""
+import os
+import tempfile
+from datetime import date
+import numpy as np
+from django.conf import settings
+from django.db.models import FloatField, Min
+from django.db.models.functions import Cast, TruncDate
+from django.utils import timezone
+from products.models import Product
+from .models import Order, OrderItem
+
+CATEGORIES = [code for code, _ in Product.CATEGORY_CHOICES] + ["Other"]
+PERIODS = ("day", "week", "month")
+ROLLING_WINDOWS = (7, 30)
+
+_loaded = {"mtime": None, "data": None}
+
+
+def snapshot_path():
+    default = os.path.join(
+        getattr(settings, "PROJECT_ROOT", settings.BASE_DIR),
+        "var",
+        "analytics",
+        "sales.npz",
+    )
+    return getattr(settings, "ANALYTICS_SNAPSHOT_PATH", default)
+
+
+def _day_numbers(dates):
+    return np.array(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+def _kobo(amounts):
+    return np.rint(np.array(amounts, dtype=np.float64) * 100).astype(np.int64)
+
+
+def _order_chunks(chunk_size):
+    """Completed orders as ``(ids, day numbers)`` arrays, in id order."""
+    orders = Order.objects.filter(status="completed").annotate(day=TruncDate("created_at"))
+    last_id = 0
+    while True:
+        rows = list(
+            orders.filter(id__gt=last_id).order_by("id").values_list("id", "day")[:chunk_size]
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        ids, days = zip(*rows)
+        yield np.array(ids, dtype=np.int64), _day_numbers(days)
+
+
+def _lines(first_id, last_id):
+    """Lines of completed orders in an id range as plain numeric columns."""
+    rows = list(
+        OrderItem.objects.filter(
+            order_id__gte=first_id,
+            order_id__lte=last_id,
+            order__status="completed",
+        )
+        # A float keeps the driver from building a Decimal per row.
+        .annotate(unit_price=Cast("price", FloatField()))
+        .values_list("order_id", "product_id", "quantity", "unit_price")
+    )
+    if not rows:
+        return None
+    order_ids, product_ids, quantities, prices = zip(*rows)
+    return (
+        np.array(order_ids, dtype=np.int64),
+        np.array(product_ids, dtype=np.int64),
+        np.array(quantities, dtype=np.int64),
+        _kobo(prices),
+    )
+
+
+def _product_categories():
+    """Category code for every product id, ``Other`` for unknown ids."""
+    rows = list(Product.objects.values_list("id", "category"))
+    slots = max((pk for pk, _ in rows), default=0) + 1
+    codes = np.full(slots, len(CATEGORIES) - 1, dtype=np.int64)
+    for pk, category in rows:
+        if category in CATEGORIES:
+            codes[pk] = CATEGORIES.index(category)
+    return codes
+
+
+def build_snapshot(chunk_size=20000, path=None):
+    """
+    Compute the sales arrays from scratch and save them; returns the path.
+
+    Orders are read ``chunk_size`` at a time and their lines fetched by
+    order id range, so only orders need a (timezone-aware) date; each line
+    finds its day through ``searchsorted`` on the chunk's order ids and its
+    category through a product id lookup array.
+    """
+    bounds = Order.objects.filter(status="completed").aggregate(first=Min("created_at"))
+    first_day = timezone.localdate(bounds["first"]) if bounds["first"] else timezone.localdate()
+    start = (first_day - date(1970, 1, 1)).days
+    days = (timezone.localdate() - first_day).days + 1
+    categories = len(CATEGORIES)
+    category_of = _product_categories()
+    product_slots = len(category_of)
+
+    orders = np.zeros(days, dtype=np.int64)
+    units = np.zeros(days, dtype=np.int64)
+    category_revenue = np.zeros(days * categories, dtype=np.int64)
+    category_units = np.zeros(days * categories, dtype=np.int64)
+    product_units = np.zeros(product_slots, dtype=np.int64)
+    product_revenue = np.zeros(product_slots, dtype=np.int64)
+
+    def fold(index, weights, size):
+        return np.bincount(index, weights=weights, minlength=size).astype(np.int64)
+
+    for order_ids, order_days in _order_chunks(chunk_size):
+        order_days = np.clip(order_days - start, 0, days - 1)
+        orders += np.bincount(order_days, minlength=days)
+        lines = _lines(order_ids[0], order_ids[-1])
+        if lines is None:
+            continue
+        line_orders, products, quantity, prices = lines
+        position = np.clip(np.searchsorted(order_ids, line_orders), 0, len(order_ids) - 1)
+        # Skip lines of orders completed, or products added, mid-run.
+        known = (order_ids[position] == line_orders) & (products < product_slots)
+        index = order_days[position[known]]
+        products, quantity = products[known], quantity[known]
+        revenue = prices[known] * quantity
+        cells = index * categories + category_of[products]
+
+        units += fold(index, quantity, days)
+        category_revenue += fold(cells, revenue, days * categories)
+        category_units += fold(cells, quantity, days * categories)
+        product_units += fold(products, quantity, product_slots)
+        product_revenue += fold(products, revenue, product_slots)
+
+    sold = np.flatnonzero(product_units)
+    path = path or snapshot_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write next to the target and rename so readers never see half a file.
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".npz")
+    with os.fdopen(handle, "wb") as temp_file:
+        np.savez_compressed(
+            temp_file,
+            start=np.int64(start),
+            generated_at=np.float64(timezone.now().timestamp()),
+            categories=np.array(CATEGORIES),
+            orders=orders,
+            units=units,
+            category_revenue=category_revenue.reshape(days, categories),
+            category_units=category_units.reshape(days, categories),
+            product_ids=sold,
+            product_units=product_units[sold],
+            product_revenue=product_revenue[sold],
+        )
+    os.replace(temp_path, path)
+    return path
+
+
+def load_snapshot(path=None):
+    """The saved arrays as a dict, re-read only when the file changes."""
+    path = path or snapshot_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _loaded["mtime"] != (path, mtime):
+        with np.load(path) as archive:
+            _loaded["data"] = {name: archive[name] for name in archive.files}
+        _loaded["mtime"] = (path, mtime)
+    return _loaded["data"]
+
+
+def _period_keys(dates, period):
+    if period == "month":
+        return dates.astype("datetime64[M]").astype("datetime64[D]")
+    if period == "week":
+        # datetime64 weeks start on Thursday; step back to Monday instead.
+        weekday = (dates.astype(np.int64) + 3) % 7
+        return dates - weekday.astype("timedelta64[D]")
+    return dates
+
+
+def rolling_sum(values, window):
+    totals = np.cumsum(values)
+    totals[window:] = totals[window:] - totals[:-window]
+    return totals
+
+
+def summarize(snapshot, period="day", limit=30):
+    """
+    Revenue, units, orders, basket size and category mix per period.
+
+    Returns the last ``limit`` periods, oldest first, as lists ready for a
+    template or a chart.
+    """
+    days = len(snapshot["orders"])
+    dates = np.arange(days).astype("datetime64[D]") + snapshot["start"]
+    keys, group = np.unique(_period_keys(dates, period), return_inverse=True)
+    groups = len(keys)
+
+    def fold(values):
+        return np.bincount(group, weights=values, minlength=groups)
+
+    revenue = snapshot["category_revenue"].sum(axis=1)
+    period_revenue = fold(revenue) / 100
+    period_units = fold(snapshot["units"])
+    period_orders = fold(snapshot["orders"])
+    category_revenue = np.stack(
+        [fold(snapshot["category_revenue"][:, code]) for code in range(len(snapshot["categories"]))],
+        axis=1,
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        basket_units = np.where(period_orders > 0, period_units / period_orders, 0)
+        basket_value = np.where(period_orders > 0, period_revenue / period_orders, 0)
+        mix = np.where(
+            category_revenue.sum(axis=1, keepdims=True) > 0,
+            category_revenue / category_revenue.sum(axis=1, keepdims=True),
+            0,
+        )
+
+    tail = slice(max(groups - limit, 0), groups)
+    rows = []
+    for position in range(groups)[tail]:
+        rows.append(
+            {
+                "period": keys[position].astype(object),
+                "revenue": float(period_revenue[position]),
+                "units": int(period_units[position]),
+                "orders": int(period_orders[position]),
+                "basket_units": float(basket_units[position]),
+                "basket_value": float(basket_value[position]),
+                "mix": [round(float(share) * 100, 1) for share in mix[position]],
+            }
+        )
+
+    rolling = {
+        f"{window}d": (rolling_sum(revenue, window)[-limit:] / 100).tolist()
+        for window in ROLLING_WINDOWS
+    }
+    return {
+        "rows": rows,
+        "categories": [str(name) for name in snapshot["categories"]],
+        "rolling_labels": [str(day) for day in dates[-limit:]],
+        "rolling": rolling,
+    }
+
+
+def top_products(snapshot, limit=10):
+    """``(product_id, units, revenue)`` for the best-selling products by revenue."""
+    order = np.argsort(snapshot["product_revenue"])[::-1][:limit]
+    return [
+        (
+            int(snapshot["product_ids"][index]),
+            int(snapshot["product_units"][index]),
+            float(snapshot["product_revenue"][index]) / 100,
+        )
+        for index in order
+    ]
@@ -0,0 +1,258 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from products.models import Product
+from .models import Cart, CartItem
+from .reservations import available_stock
+
+SESSION_KEY = "cart_id"
+# Product columns the cart, checkout and order summary actually read.
+CART_PRODUCT_FIELDS = ("product__name", "product__price", "product__stock")
+
+
+def _load_cart(request):
+    if request.user.is_authenticated:
+        return Cart.objects.filter(user=request.user).first()
+    cart_id = request.session.get(SESSION_KEY)
+    if cart_id is None:
+        return None
+    return Cart.objects.filter(pk=cart_id, user__isnull=True).first()
+
+
+def _create_cart(request):
+    if request.user.is_authenticated:
+        cart, _ = Cart.objects.get_or_create(user=request.user)
+        return cart
+    cart = Cart.objects.create()
+    # The session is only written when an anonymous cart is created; item
+    # changes touch the cart rows, not the session.
+    request.session[SESSION_KEY] = cart.pk
+    return cart
+
+
+def _import_session_cart(request, cart):
+    """Move a cart left in the session by the old session-dict storage."""
+    legacy = request.session.pop("cart", None)
+    if not legacy:
+        return
+    lines = {}
+    for product_id, quantity in legacy.items():
+        try:
+            lines[int(product_id)] = int(quantity)
+        except (TypeError, ValueError):
+            continue
+    set_quantities(cart, _available_lines(lines))
+
+
+def _available_lines(lines):
+    """``lines`` without products that are gone or sold out, capped at stock."""
+    wanted = {product_id: quantity for product_id, quantity in lines.items() if quantity > 0}
+    if not wanted:
+        return {}
+    available = available_stock(Product.objects.filter(pk__in=wanted).only("stock"))
+    return {
+        product_id: min(wanted[product_id], units)
+        for product_id, units in available.items()
+        if units > 0
+    }
+
+
+def get_cart(request, create=False):
+    """
+    Return the current visitor's cart, cached on the request.
+
+    Logged-in customers have one cart tied to their account; anonymous
+    visitors get one whose id is kept in the session. With ``create=False``
+    ``None`` is returned when no cart exists yet.
+    """
+    if hasattr(request, "_cart"):
+        if request._cart is not None or not create:
+            return request._cart
+        cart = None
+    else:
+        cart = _load_cart(request)
+    if cart is None and (create or request.session.get("cart")):
+        cart = _create_cart(request)
+    if cart is not None:
+        _import_session_cart(request, cart)
+    request._cart = cart
+    return cart
+
+
+class CartSnapshot:
+    """
+    The cart's lines and products for one request.
+
+    Lines and products are fetched together by a single joined query with
+    only the product columns in ``CART_PRODUCT_FIELDS``, the first time
+    ``items`` or ``total`` is used. ``count`` comes from the cart row.
+    """
+
+    def __init__(self, cart):
+        self.cart = cart
+        self.version = _version(cart)
+        self._items = None
+        self._total = None
+
+    @property
+    def count(self):
+        return self.cart.item_count if self.cart is not None else 0
+
+    @property
+    def items(self):
+        if self._items is None:
+            self._load()
+        return self._items
+
+    @property
+    def total(self):
+        if self._items is None:
+            self._load()
+        return self._total
+
+    @property
+    def lines(self):
+        return {item["product"].id: item["quantity"] for item in self.items}
+
+    def _load(self):
+        self._items = []
+        self._total = Decimal("0.00")
+        if self.cart is None:
+            return
+        cart_items = (
+            self.cart.items.select_related("product")
+            .only("cart", "quantity", *CART_PRODUCT_FIELDS)
+            .order_by("product_id")
+        )
+        for cart_item in cart_items:
+            product = cart_item.product
+            line_total = product.price * cart_item.quantity
+            self._total += line_total
+            self._items.append(
+                {
+                    "product": product,
+                    "quantity": cart_item.quantity,
+                    "line_total": line_total,
+                }
+            )
+
+
+def _version(cart):
+    return getattr(cart, "_version", 0) if cart is not None else 0
+
+
+def _touch(cart):
+    cart._version = _version(cart) + 1
+
+
+def cart_snapshot(request):
+    """Return the request's ``CartSnapshot``, rebuilt if the cart changed."""
+    cart = get_cart(request)
+    snapshot = getattr(request, "_cart_snapshot", None)
+    if snapshot is None or snapshot.cart is not cart or snapshot.version != _version(cart):
+        snapshot = CartSnapshot(cart)
+        request._cart_snapshot = snapshot
+    return snapshot
+
+
+def cart_lines(cart):
+    """Quantities in the cart as ``{product_id: quantity}``."""
+    if cart is None:
+        return {}
+    return dict(cart.items.values_list("product_id", "quantity"))
+
+
+def _refresh_count(cart):
+    total = (
+        CartItem.objects.filter(cart=OuterRef("pk"))
+        .values("cart")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    Cart.objects.filter(pk=cart.pk).update(
+        item_count=Coalesce(Subquery(total), 0),
+        updated_at=timezone.now(),
+    )
+    cart.refresh_from_db(fields=["item_count", "updated_at"])
+    _touch(cart)
+
+
+def set_quantities(cart, lines):
+    """
+    Upsert ``{product_id: quantity}`` into the cart in one statement.
+
+    Lines with a quantity of zero or less are removed.
+    """
+    keep = {pid: qty for pid, qty in lines.items() if qty > 0}
+    drop = [pid for pid, qty in lines.items() if qty <= 0]
+    with transaction.atomic():
+        if drop:
+            CartItem.objects.filter(cart=cart, product_id__in=drop).delete()
+        if keep:
+            CartItem.objects.bulk_create(
+                [
+                    CartItem(cart=cart, product_id=product_id, quantity=quantity)
+                    for product_id, quantity in keep.items()
+                ],
+                update_conflicts=True,
+                unique_fields=["cart", "product"],
+                update_fields=["quantity"],
+            )
+        _refresh_count(cart)
+
+
+def set_quantity(cart, product_id, quantity):
+    set_quantities(cart, {product_id: quantity})
+
+
+def remove_item(cart, product_id):
+    set_quantities(cart, {product_id: 0})
+
+
+def clear_cart(cart):
+    if cart is None:
+        return
+    with transaction.atomic():
+        cart.items.all().delete()
+        Cart.objects.filter(pk=cart.pk).update(item_count=0, updated_at=timezone.now())
+    cart.item_count = 0
+    _touch(cart)
+
+
+def merge_session_cart(request, user):
+    """
+    Fold the anonymous cart into ``user``'s cart after login.
+
+    Quantities for products present in both carts are added together, up
+    to the stock still available.
+    """
+    cart_id = request.session.pop(SESSION_KEY, None)
+    legacy = request.session.get("cart")
+    if cart_id is None and not legacy:
+        return
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(user=user)
+        request._cart = cart
+        _import_session_cart(request, cart)
+        anonymous = Cart.objects.filter(pk=cart_id, user__isnull=True).first()
+        if anonymous is None:
+            return
+        incoming = cart_lines(anonymous)
+        if incoming:
+            existing = dict(
+                cart.items.filter(product_id__in=incoming.keys()).values_list(
+                    "product_id", "quantity"
+                )
+            )
+            set_quantities(
+                cart,
+                _available_lines(
+                    {
+                        product_id: existing.get(product_id, 0) + quantity
+                        for product_id, quantity in incoming.items()
+                    }
+                ),
+            )
+        anonymous.delete()
@@ -0,0 +1,60 @@
+import uuid
+from django.db import transaction
+from .metrics import record_new_order
+from .models import Order, OrderItem
+from .reservations import reserve_stock
+
+
+def _customer_name(user):
+    full_name = user.get_full_name().strip()
+    if not full_name:
+        full_name = user.first_name.strip()
+    if not full_name:
+        full_name = user.email or user.username
+    return full_name
+
+
+def _customer_phone(user):
+    if hasattr(user, "customerprofile"):
+        return user.customerprofile.phone
+    return ""
+
+
+def place_order(user, items, total, delivery_method, payment_method, delivery_address):
+    """
+    Create an order and all of its lines in one transaction.
+
+    ``items`` and ``total`` come from the ``CartSnapshot`` so the products are
+    already loaded; the lines are written with a single ``bulk_create`` and
+    returned alongside the order so callers can summarise them without
+    querying again. Stock for every line is reserved in the same
+    transaction; ``InsufficientStock`` is raised, and nothing is saved, when
+    a line cannot be held. The number of queries does not depend on the
+    cart size.
+    """
+    with transaction.atomic():
+        order = Order.objects.create(
+            user=user,
+            full_name=_customer_name(user),
+            phone=_customer_phone(user),
+            delivery_method=delivery_method,
+            payment_method=payment_method,
+            delivery_address=delivery_address,
+            total_amount=total,
+            status="awaiting_payment" if payment_method == "pay_on_delivery" else "pending",
+            payment_reference=uuid.uuid4().hex,
+        )
+        order_items = OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    product=item["product"],
+                    quantity=item["quantity"],
+                    price=item["product"].price,
+                )
+                for item in items
+            ]
+        )
+        reserve_stock(order, order_items)
+        record_new_order(order)
+    return order, order_items
@@ -1,9 +1,7 @@
+from .cart import cart_snapshot
+
+
 def cart_count(request):
-    cart = request.session.get("cart", {})
-    total_qty = 0
-    for qty in cart.values():
-        try:
-            total_qty += int(qty)
-        except (TypeError, ValueError):
-            continue
-    return {"cart_count": total_qty}
+    if request.user.is_authenticated and request.user.is_staff:
+        return {"cart_count": 0}
+    return {"cart_count": cart_snapshot(request).count}
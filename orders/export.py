@@ -0,0 +1,180 @@
+import csv
+import json
+import zlib
+from collections import defaultdict
+from itertools import islice
+from django.utils import timezone
+from .models import OrderItem
+
+EXPORT_FIELDS = (
+    "order_id",
+    "created_at",
+    "status",
+    "customer_name",
+    "customer_email",
+    "phone",
+    "delivery_method",
+    "delivery_address",
+    "payment_method",
+    "payment_reference",
+    "payment_verified_at",
+    "item_count",
+    "items",
+    "total_amount",
+)
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+
+ORDER_COLUMNS = (
+    "id",
+    "created_at",
+    "status",
+    "full_name",
+    "phone",
+    "delivery_method",
+    "delivery_address",
+    "payment_method",
+    "payment_reference",
+    "payment_verified_at",
+    "total_amount",
+    "user__username",
+    "user__email",
+    "user__first_name",
+    "user__last_name",
+)
+
+
+def _timestamp(value):
+    return timezone.localtime(value).isoformat(timespec="seconds") if value else ""
+
+
+def _lines_by_order(order_ids):
+    """Every line of ``order_ids`` in one query, as plain tuples per order."""
+    lines = defaultdict(list)
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .order_by("order_id", "id")
+        .values_list("order_id", "product__name", "quantity", "price")
+    )
+    for order_id, product, quantity, price in rows:
+        lines[order_id].append({"product": product, "quantity": quantity, "price": str(price)})
+    return lines
+
+
+def export_records(orders, chunk_size=2000):
+    """
+    One dict per order, read ``chunk_size`` orders at a time.
+
+    Orders come from a single streamed query (a server-side cursor on
+    PostgreSQL) and each chunk's lines from one more query, all as plain
+    rows so no model instances are built. Memory stays at one chunk
+    whatever the number of orders.
+    """
+    rows = (
+        orders.order_by("created_at", "id")
+        .values(*ORDER_COLUMNS)
+        .iterator(chunk_size=chunk_size)
+    )
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        lines = _lines_by_order([row["id"] for row in chunk])
+        for row in chunk:
+            items = lines.get(row["id"], [])
+            full_name = f"{row['user__first_name']} {row['user__last_name']}".strip()
+            yield {
+                "order_id": row["id"],
+                "created_at": _timestamp(row["created_at"]),
+                "status": row["status"],
+                "customer_name": row["full_name"] or full_name or row["user__username"],
+                "customer_email": row["user__email"],
+                "phone": row["phone"],
+                "delivery_method": row["delivery_method"],
+                "delivery_address": row["delivery_address"],
+                "payment_method": row["payment_method"],
+                "payment_reference": row["payment_reference"] or "",
+                "payment_verified_at": _timestamp(row["payment_verified_at"]),
+                "item_count": sum(item["quantity"] for item in items),
+                "items": items,
+                "total_amount": str(row["total_amount"]),
+            }
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+# Leading characters that make Excel and Sheets read a cell as a formula.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _cell(value):
+    """Customer-entered text made inert for spreadsheets by a leading quote."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def csv_lines(records):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for record in records:
+        record = dict(
+            record,
+            items="; ".join(
+                f"{item['product']} x{item['quantity']} @ {item['price']}"
+                for item in record["items"]
+            ),
+        )
+        yield writer.writerow([_cell(record[field]) for field in EXPORT_FIELDS])
+
+
+def jsonl_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def encoded(lines, compress=False, block_size=64 * 1024):
+    """
+    Turn text lines into byte blocks of about ``block_size``, gzipped if asked.
+
+    The first line (the CSV header or first record) is sent on its own, and
+    the compressor flushed after it, so the download starts straight away
+    however long the query behind the rest takes.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16) if compress else None
+    block, size, first = [], 0, True
+    for line in lines:
+        block.append(line)
+        size += len(line)
+        if first or size >= block_size:
+            data = "".join(block).encode("utf-8")
+            if compressor:
+                data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            yield data
+            block, size, first = [], 0, False
+    data = "".join(block).encode("utf-8")
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+def export_stream(orders, export_format="csv", compress=False, chunk_size=2000):
+    records = export_records(orders, chunk_size=chunk_size)
+    lines = jsonl_lines(records) if export_format == "jsonl" else csv_lines(records)
+    return encoded(lines, compress=compress)
+
+
+def export_filename(export_format, compress=False):
+    name = f"orders-{timezone.localdate():%Y%m%d}.{export_format}"
+    return f"{name}.gz" if compress else name
+
@@ -0,0 +1,82 @@
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from orders.cart import set_quantities
+from orders.models import Cart
+from products.models import Product
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark POST /orders/checkout/ for several cart sizes. "
+        "All data is created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50])
+        parser.add_argument("--runs", type=int, default=20)
+
+    def handle(self, *args, **options):
+        rows = []
+        with override_settings(
+            ALLOWED_HOSTS=["testserver"],
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+        ):
+            try:
+                with transaction.atomic():
+                    for size in options["sizes"]:
+                        rows.append(self._run(size, options["runs"]))
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+        self.stdout.write(f"{'lines':>6} {'queries':>8} {'median ms':>10} {'p95 ms':>8}")
+        for size, queries, median, p95 in rows:
+            self.stdout.write(f"{size:>6} {queries:>8} {median:>10.2f} {p95:>8.2f}")
+
+    def _run(self, size, runs):
+        user = User.objects.create_user(
+            username=f"bench-{size}@example.com",
+            email=f"bench-{size}@example.com",
+            password="bench",
+        )
+        products = [
+            Product(
+                name=f"Bench product {size}-{index}",
+                category="Poultry",
+                price=1000,
+                stock=runs * 10,
+            )
+            for index in range(size)
+        ]
+        products = Product.objects.bulk_create(products)
+        cart = Cart.objects.create(user=user)
+        lines = {product.id: 1 for product in products}
+
+        client = Client()
+        client.force_login(user)
+        url = reverse("orders:checkout")
+        payload = {"delivery_method": "pickup", "payment_method": "pay_on_delivery"}
+
+        timings = []
+        queries = 0
+        for _ in range(runs):
+            set_quantities(cart, lines)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                client.post(url, payload)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = len(captured)
+
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        return size, queries, statistics.median(timings), p95
@@ -0,0 +1,64 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from orders.models import Order
+from orders.reservations import release_reservations
+from orders.transitions import transition_orders
+
+OPEN_STATUSES = ("pending", "awaiting_payment")
+
+
+class Command(BaseCommand):
+    help = (
+        "Cancel pending and awaiting-payment orders older than a given age "
+        "and release the stock they hold."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=float,
+            default=getattr(settings, "STALE_ORDER_HOURS", 72),
+            help="Age after which an unpaid order is considered abandoned.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many orders would be cancelled.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["hours"])
+        stale = Order.objects.filter(status__in=OPEN_STATUSES, created_at__lt=cutoff)
+
+        if options["dry_run"]:
+            counts = stale.values("status").annotate(total=Count("id")).order_by("status")
+            total = 0
+            for row in counts:
+                total += row["total"]
+                self.stdout.write(f"{row['status']}: {row['total']}")
+            self.stdout.write(f"{total} order(s) older than {cutoff:%Y-%m-%d %H:%M} would be cancelled.")
+            return
+
+        cancelled = 0
+        while True:
+            # Each chunk is its own short transaction so row locks are held
+            # only for one small UPDATE at a time.
+            with transaction.atomic():
+                ids = list(
+                    stale.select_for_update(skip_locked=True)
+                    .order_by("created_at")
+                    .values_list("id", flat=True)[: options["chunk_size"]]
+                )
+                if not ids:
+                    break
+                moved = transition_orders(ids, "cancelled", source="expire_stale_orders")
+                release_reservations(moved)
+            cancelled += len(moved)
+            self.stdout.write(f"cancelled {cancelled} order(s) so far")
+
+        self.stdout.write(self.style.SUCCESS(f"Cancelled {cancelled} stale order(s)."))
@@ -0,0 +1,52 @@
+import sys
+from datetime import datetime, time, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from orders.export import EXPORT_FORMATS, export_stream
+from orders.models import Order
+
+
+def _day(value):
+    day = parse_date(value)
+    if day is None:
+        raise CommandError(f"Invalid date: {value} (expected YYYY-MM-DD)")
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class Command(BaseCommand):
+    help = "Stream orders with their customer, items, delivery and payment details as CSV or JSON lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="csv")
+        parser.add_argument("--status", choices=[value for value, _ in Order.STATUS_CHOICES])
+        parser.add_argument("--date-from", help="First day to include, YYYY-MM-DD.")
+        parser.add_argument("--date-to", help="Last day to include, YYYY-MM-DD.")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--output", help="File to write (default: stdout).")
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if options["status"]:
+            orders = orders.filter(status=options["status"])
+        if options["date_from"]:
+            orders = orders.filter(created_at__gte=_day(options["date_from"]))
+        if options["date_to"]:
+            orders = orders.filter(created_at__lt=_day(options["date_to"]) + timedelta(days=1))
+
+        chunks = export_stream(
+            orders,
+            options["format"],
+            compress=options["gzip"],
+            chunk_size=options["chunk_size"],
+        )
+        output = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if options["output"]:
+                output.close()
+            else:
+                output.flush()
@@ -0,0 +1,248 @@
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class PaystackSimulator:
+    """In-memory stand-in for the parts of the Paystack API the shop uses."""
+
+    def __init__(self, options, secret_key, stdout):
+        self.options = options
+        self.secret_key = secret_key
+        self.stdout = stdout
+        self.transactions = {}
+        self.lock = threading.Lock()
+        self.webhooks = ThreadPoolExecutor(max_workers=options["webhook_workers"])
+        self.webhook_session = requests.Session()
+
+    def delay(self):
+        latency = self.options["latency"] + random.uniform(0, self.options["jitter"])
+        if latency:
+            time.sleep(latency / 1000)
+
+    def should_fail(self):
+        return random.random() < self.options["error_rate"]
+
+    def initialize(self, payload, base_url):
+        reference = payload.get("reference") or uuid.uuid4().hex
+        transaction = {
+            "reference": reference,
+            "amount": payload.get("amount"),
+            "email": payload.get("email"),
+            "metadata": payload.get("metadata", {}),
+            "callback_url": payload.get("callback_url", ""),
+            "status": "abandoned",
+        }
+        with self.lock:
+            self.transactions[reference] = transaction
+        if self.options["auto_pay"]:
+            self.pay(reference)
+        return {
+            "status": True,
+            "message": "Authorization URL created",
+            "data": {
+                "authorization_url": f"{base_url}/checkout/{reference}",
+                "access_code": uuid.uuid4().hex[:15],
+                "reference": reference,
+            },
+        }
+
+    def verify(self, reference):
+        with self.lock:
+            transaction = self.transactions.get(reference)
+        if transaction is None:
+            return 404, {"status": False, "message": "Transaction reference not found"}
+        return 200, {
+            "status": True,
+            "message": "Verification successful",
+            "data": {
+                "status": transaction["status"],
+                "reference": reference,
+                "amount": transaction["amount"],
+                "metadata": transaction["metadata"],
+                "customer": {"email": transaction["email"]},
+            },
+        }
+
+    def pay(self, reference):
+        with self.lock:
+            transaction = self.transactions.get(reference)
+            if transaction is None:
+                return None
+            transaction["status"] = "success"
+        deliveries = 2 if random.random() < self.options["duplicate_rate"] else 1
+        for _ in range(deliveries):
+            self.webhooks.submit(self.send_webhook, transaction)
+        return transaction
+
+    def send_webhook(self, transaction):
+        if not self.options["webhook_url"]:
+            return
+        # A random hold per delivery lets later payments overtake earlier
+        # ones, so webhooks arrive out of order.
+        time.sleep(random.uniform(0, self.options["webhook_jitter"]) / 1000)
+        body = json.dumps(
+            {
+                "event": "charge.success",
+                "data": {
+                    "reference": transaction["reference"],
+                    "status": "success",
+                    "amount": transaction["amount"],
+                    "metadata": transaction["metadata"],
+                    "customer": {"email": transaction["email"]},
+                },
+            }
+        ).encode("utf-8")
+        signature = hmac.new(self.secret_key.encode("utf-8"), body, hashlib.sha512).hexdigest()
+        try:
+            response = self.webhook_session.post(
+                self.options["webhook_url"],
+                data=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "x-paystack-signature": signature,
+                },
+                timeout=10,
+            )
+            status = response.status_code
+        except requests.RequestException as exc:
+            status = exc.__class__.__name__
+        self.stdout.write(f"webhook {transaction['reference']} -> {status}")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The stdlib default backlog of 5 refuses connections under load tests.
+    request_queue_size = 256
+
+
+def _handler_class(simulator):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _base_url(self):
+            return f"http://{self.headers.get('Host', 'localhost')}"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            simulator.delay()
+            if self.path.rstrip("/") != "/transaction/initialize":
+                self._send_json(404, {"status": False, "message": "Not found"})
+                return
+            if simulator.should_fail():
+                self._send_json(500, {"status": False, "message": "Simulated error"})
+                return
+            try:
+                payload = json.loads(raw.decode("utf-8") or "{}")
+            except json.JSONDecodeError:
+                self._send_json(400, {"status": False, "message": "Invalid JSON"})
+                return
+            self._send_json(200, simulator.initialize(payload, self._base_url()))
+
+        def do_GET(self):
+            simulator.delay()
+            if self.path.startswith("/transaction/verify/"):
+                if simulator.should_fail():
+                    self._send_json(500, {"status": False, "message": "Simulated error"})
+                    return
+                reference = self.path[len("/transaction/verify/"):].split("?")[0]
+                self._send_json(*simulator.verify(reference))
+                return
+            if self.path.startswith("/checkout/"):
+                # Stands in for the hosted payment page: pay, then send the
+                # customer back to the shop's callback URL like Paystack does.
+                reference = self.path[len("/checkout/"):].split("?")[0]
+                transaction = simulator.pay(reference)
+                if transaction is None:
+                    self._send_json(404, {"status": False, "message": "Unknown reference"})
+                    return
+                location = transaction["callback_url"]
+                separator = "&" if "?" in location else "?"
+                location = f"{location}{separator}{urlencode({'reference': reference, 'trxref': reference})}"
+                self.send_response(302)
+                self.send_header("Location", location)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self._send_json(404, {"status": False, "message": "Not found"})
+
+        def log_message(self, format, *args):
+            if simulator.options["verbosity"] > 1:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local Paystack stand-in for load testing. "
+        "Point PAYSTACK_BASE_URL at it, e.g. http://127.0.0.1:8787."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8787)
+        parser.add_argument("--latency", type=float, default=0, help="Base latency in ms.")
+        parser.add_argument("--jitter", type=float, default=0, help="Extra random latency in ms.")
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0,
+            help="Fraction of API calls answered with HTTP 500.",
+        )
+        parser.add_argument(
+            "--webhook-url",
+            default="http://127.0.0.1:8000/orders/paystack/webhook/",
+            help="Where charge.success webhooks are delivered; empty to disable.",
+        )
+        parser.add_argument(
+            "--duplicate-rate",
+            type=float,
+            default=0,
+            help="Fraction of payments whose webhook is delivered twice.",
+        )
+        parser.add_argument(
+            "--webhook-jitter",
+            type=float,
+            default=0,
+            help="Random hold in ms before each webhook; reorders deliveries.",
+        )
+        parser.add_argument("--webhook-workers", type=int, default=8)
+        parser.add_argument(
+            "--auto-pay",
+            action="store_true",
+            help="Mark transactions paid as soon as they are initialized.",
+        )
+
+    def handle(self, *args, **options):
+        simulator = PaystackSimulator(options, settings.PAYSTACK_SECRET_KEY, self.stdout)
+        server = _Server((options["host"], options["port"]), _handler_class(simulator))
+        self.stdout.write(
+            f"Paystack simulator listening on http://{options['host']}:{options['port']}"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            simulator.webhooks.shutdown(wait=False)
@@ -0,0 +1,63 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from orders.models import Order
+from orders.picking import orders_to_pick, packing_sheets, pick_list
+
+
+class Command(BaseCommand):
+    help = "Print the products to pick for a day's orders, or write their packing sheets as HTML."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Order date, YYYY-MM-DD (default: today).")
+        parser.add_argument("--delivery-method", choices=[value for value, _ in Order.DELIVERY_CHOICES])
+        parser.add_argument(
+            "--status",
+            choices=[value for value, _ in Order.STATUS_CHOICES],
+            help="Only this status (default: every status but cancelled and failed).",
+        )
+        parser.add_argument(
+            "--packing-sheets",
+            action="store_true",
+            help="Write the printable pick list and per-order sheets instead.",
+        )
+        parser.add_argument("--output", help="File to write (default: stdout).")
+
+    def handle(self, *args, **options):
+        day = timezone.localdate()
+        if options["date"]:
+            day = parse_date(options["date"])
+            if day is None:
+                raise CommandError(f"Invalid date: {options['date']} (expected YYYY-MM-DD)")
+        orders = orders_to_pick(day, options["delivery_method"], options["status"])
+
+        if options["packing_sheets"]:
+            output = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+            try:
+                for chunk in packing_sheets(orders, title=day.strftime("%a %d %b %Y")):
+                    output.write(chunk)
+            finally:
+                if options["output"]:
+                    output.close()
+                else:
+                    output.flush()
+            return
+
+        rows = pick_list(orders)
+        width = max([len(row["name"]) for row in rows] + [7])
+        lines = [f"Pick list for {day:%a %d %b %Y}", f"{'Product':<{width}}  {'Qty':>6}  {'Orders':>6}"]
+        category = None
+        for row in rows:
+            if row["category"] != category:
+                category = row["category"]
+                lines.append(f"-- {category}")
+            lines.append(f"{row['name']:<{width}}  {row['quantity']:>6}  {row['orders']:>6}")
+        if not rows:
+            lines.append("No orders to pick.")
+        text = "\n".join(lines) + "\n"
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                output.write(text)
+        else:
+            self.stdout.write(text, ending="")
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from orders.webhooks import process_webhook_events
+
+
+class Command(BaseCommand):
+    help = "Apply stored Paystack webhook events in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new events instead of exiting when none are pending.",
+        )
+        parser.add_argument("--interval", type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        while True:
+            handled = process_webhook_events(options["batch_size"])
+            if handled:
+                self.stdout.write(f"processed {handled} event(s)")
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,30 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from orders.metrics import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily order and product sales rollups behind the "
+        "admin dashboard from the orders themselves. Run it while no orders "
+        "are being placed or paid."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Only rebuild this many most recent days (default: everything).",
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options["days"]:
+            since = timezone.localdate() - timedelta(days=options["days"] - 1)
+        order_rows, sales_rows = rebuild(since)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {order_rows} daily order row(s) and {sales_rows} product sales row(s)."
+            )
+        )
@@ -0,0 +1,124 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import requests
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from orders.models import Order
+from orders.paystack import paystack, payment_mismatch
+from orders.reservations import release_reservations
+from orders.stock import deduct_stock_for_orders
+from orders.transitions import transition_orders
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls at most ``rate`` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self.lock = threading.Lock()
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            wait_for = self.next_at - now
+            self.next_at = max(self.next_at, now) + self.interval
+        if wait_for > 0:
+            time.sleep(wait_for)
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify Paystack orders still pending after --minutes and record "
+        "the result, for payments whose redirect and webhook were both lost."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--minutes", type=int, default=15)
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=20,
+            help="Maximum verify calls per second (0 for no limit).",
+        )
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options["minutes"])
+        pending = Order.objects.filter(
+            status="pending",
+            payment_method="paystack",
+            created_at__lt=cutoff,
+            payment_reference__isnull=False,
+        ).only("id", "user_id", "total_amount", "payment_method", "payment_reference", "created_at")
+
+        limiter = RateLimiter(options["rate"])
+        totals = {"completed": 0, "failed": 0, "unchanged": 0, "errors": 0}
+        last_id = 0
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            while True:
+                chunk = list(pending.filter(id__gt=last_id).order_by("id")[: options["chunk_size"]])
+                if not chunk:
+                    break
+                last_id = chunk[-1].id
+
+                def verify(order):
+                    limiter.wait()
+                    try:
+                        return order, paystack.verify_transaction(order.payment_reference)
+                    except requests.RequestException:
+                        return order, None
+
+                results = list(pool.map(verify, chunk))
+                self._apply(results, totals)
+                self.stdout.write(
+                    f"checked {sum(totals.values())} order(s) in "
+                    f"{time.monotonic() - started:.1f}s: {totals}"
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Reconciliation finished: {totals}"))
+
+    def _apply(self, results, totals):
+        paid, failed = [], []
+        for order, data in results:
+            if data is None:
+                totals["errors"] += 1
+                continue
+            paystack_data = data.get("data") or {}
+            status = paystack_data.get("status")
+            if not data.get("status"):
+                totals["unchanged"] += 1
+            elif status == "success":
+                if payment_mismatch(order, paystack_data):
+                    failed.append(order.id)
+                else:
+                    paid.append(order)
+            elif status in ("failed", "reversed"):
+                failed.append(order.id)
+            else:
+                # abandoned / ongoing: the customer may still pay.
+                totals["unchanged"] += 1
+
+        if paid:
+            completed = set(
+                transition_orders(
+                    [order.id for order in paid],
+                    "completed",
+                    source="reconcile_paystack_orders",
+                    payment_verified_at=timezone.now(),
+                )
+            )
+            totals["completed"] += len(completed)
+            totals["unchanged"] += len(paid) - len(completed)
+            deduct_stock_for_orders(completed)
+        if failed:
+            marked = transition_orders(failed, "failed", source="reconcile_paystack_orders")
+            totals["failed"] += len(marked)
+            totals["unchanged"] += len(failed) - len(marked)
+            release_reservations(marked)
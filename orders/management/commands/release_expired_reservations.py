@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from orders.reservations import release_expired
+
+
+class Command(BaseCommand):
+    help = "Release stock reservations whose time limit has passed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep sweeping instead of exiting once nothing has expired.",
+        )
+        parser.add_argument("--interval", type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        while True:
+            released = 0
+            while True:
+                count = release_expired(options["chunk_size"])
+                if not count:
+                    break
+                released += count
+            if released:
+                self.stdout.write(f"released {released} reservation(s)")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,219 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DateField, DecimalField, F, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import DailyOrderStats, DailyProductSales, Order, OrderItem
+
+# Orders are counted on the (local) day they were placed, under their
+# current status, so a status change moves them between rows of that day.
+#
+# The rollups are written once the order change commits, in their own short
+# transaction. Every checkout and payment touches the same (day, status)
+# rows; bumping them inside the transactions that lock products would queue
+# all checkouts on one row while they hold stock, and take the two kinds of
+# lock in opposite orders on different paths. A crash in between leaves the
+# rollups short until `manage.py rebuild_order_metrics --days 1`.
+
+
+def _bump(model, keys, defaults=None, **deltas):
+    """Add ``deltas`` to the row identified by ``keys``, creating it if needed."""
+    updates = {name: F(name) + value for name, value in deltas.items()}
+    if model.objects.filter(**keys).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **(defaults or {}), **deltas)
+    except IntegrityError:
+        # Another transaction created the row first.
+        model.objects.filter(**keys).update(**updates)
+
+
+def _line_revenue():
+    return Sum(F("price") * F("quantity"), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _after_commit(update):
+    def run():
+        with transaction.atomic():
+            update()
+    transaction.on_commit(run)
+
+
+def record_new_order(order):
+    keys = {"date": timezone.localdate(order.created_at), "status": order.status}
+    total = order.total_amount
+    _after_commit(lambda: _bump(DailyOrderStats, keys, orders=1, revenue=total))
+
+
+def record_transitions(rows, to_status):
+    """
+    Move orders between the rollup rows of the day they were placed.
+
+    ``rows`` are ``(order_id, from_status, created_at, total_amount)``.
+    Applied after commit; touches one row per (day, status) pair involved,
+    in a fixed order so concurrent callers cannot deadlock; completed orders
+    also add their lines to the per-product sales.
+    """
+    rows = list(rows)
+    _after_commit(lambda: _apply_transitions(rows, to_status))
+
+
+def _apply_transitions(rows, to_status):
+    deltas = defaultdict(lambda: [0, Decimal("0")])
+    for _, from_status, created_at, total in rows:
+        day = timezone.localdate(created_at)
+        deltas[(day, from_status)][0] -= 1
+        deltas[(day, from_status)][1] -= total
+        deltas[(day, to_status)][0] += 1
+        deltas[(day, to_status)][1] += total
+    for (day, status), (orders, revenue) in sorted(deltas.items()):
+        _bump(DailyOrderStats, {"date": day, "status": status}, orders=orders, revenue=revenue)
+    if to_status == "completed":
+        _record_sales([row[0] for row in rows])
+
+
+def _sales_rows(items):
+    return (
+        items.annotate(day=TruncDate("order__created_at"))
+        .values("day", "product_id", "product__category")
+        .annotate(sold=Sum("quantity"), amount=_line_revenue())
+        .order_by("day", "product_id")
+    )
+
+
+def _record_sales(order_ids):
+    for row in _sales_rows(OrderItem.objects.filter(order_id__in=order_ids)):
+        _bump(
+            DailyProductSales,
+            {"date": row["day"], "product_id": row["product_id"]},
+            defaults={"category": row["product__category"]},
+            units=row["sold"],
+            revenue=row["amount"],
+        )
+
+
+def rebuild(since=None):
+    """
+    Recompute the rollups from the orders, for every day or from ``since``.
+
+    Run it while no orders are being placed or paid (maintenance mode or a
+    quiet hour): a bump committing while the rows are recomputed may be
+    counted twice or lost, and locking would not help, as the bump's order
+    may already be in the counts the rebuild reads. Returns how many daily
+    order and product rows were written.
+    """
+    orders = Order.objects.all()
+    items = OrderItem.objects.filter(order__status="completed")
+    order_stats = DailyOrderStats.objects.all()
+    product_sales = DailyProductSales.objects.all()
+    if since:
+        start = timezone.make_aware(datetime.combine(since, time.min))
+        orders = orders.filter(created_at__gte=start)
+        items = items.filter(order__created_at__gte=start)
+        order_stats = order_stats.filter(date__gte=since)
+        product_sales = product_sales.filter(date__gte=since)
+
+    with transaction.atomic():
+        order_stats.delete()
+        product_sales.delete()
+        written_orders = DailyOrderStats.objects.bulk_create(
+            [
+                DailyOrderStats(
+                    date=row["day"],
+                    status=row["status"],
+                    orders=row["count"],
+                    revenue=row["amount"],
+                )
+                for row in orders.annotate(day=TruncDate("created_at"))
+                .values("day", "status")
+                .annotate(count=Count("id"), amount=Sum("total_amount"))
+                .order_by()
+            ],
+            batch_size=1000,
+        )
+        written_sales = DailyProductSales.objects.bulk_create(
+            [
+                DailyProductSales(
+                    date=row["day"],
+                    product_id=row["product_id"],
+                    category=row["product__category"],
+                    units=row["sold"],
+                    revenue=row["amount"],
+                )
+                for row in _sales_rows(items)
+            ],
+            batch_size=1000,
+        )
+    return len(written_orders), len(written_sales)
+
+
+def dashboard_metrics(days=30):
+    """
+    Totals and daily trends for the admin dashboard, read from the rollups.
+
+    One grouped query per rollup table: order rows before the window are
+    folded into a single bucket per status for the totals. The work depends
+    on the number of days and products, not on how many orders there are.
+    """
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+
+    totals = defaultdict(int)
+    totals["revenue"] = Decimal("0")
+    by_day = {start + timedelta(days=offset): [0, Decimal("0")] for offset in range(days)}
+    order_rows = (
+        DailyOrderStats.objects.annotate(
+            day=Case(When(date__gte=start, then="date"), output_field=DateField())
+        )
+        .values("day", "status")
+        .annotate(count=Sum("orders"), amount=Sum("revenue"))
+        .order_by()
+    )
+    for row in order_rows:
+        totals["orders"] += row["count"]
+        totals[row["status"]] += row["count"]
+        if row["status"] == "completed":
+            totals["revenue"] += row["amount"]
+        if row["day"] in by_day:
+            by_day[row["day"]][0] += row["count"]
+            if row["status"] == "completed":
+                by_day[row["day"]][1] += row["amount"]
+
+    categories = defaultdict(Decimal)
+    products = {}
+    sales_rows = (
+        DailyProductSales.objects.filter(date__gte=start)
+        .values("product_id", "product__name", "category")
+        .annotate(units=Sum("units"), revenue=Sum("revenue"))
+        .order_by()
+    )
+    for row in sales_rows:
+        categories[row["category"]] += row["revenue"]
+        product = products.setdefault(
+            row["product_id"],
+            {"product__name": row["product__name"], "units": 0, "revenue": Decimal("0")},
+        )
+        product["units"] += row["units"]
+        product["revenue"] += row["revenue"]
+    categories = sorted(categories.items(), key=lambda item: item[1], reverse=True)
+    top_products = sorted(products.values(), key=lambda row: row["revenue"], reverse=True)[:5]
+
+    return {
+        "total_orders": totals["orders"],
+        "pending_orders": totals["pending"],
+        "completed_orders": totals["completed"],
+        "total_revenue": totals["revenue"],
+        "trend": {
+            "labels": [day.strftime("%d %b") for day in by_day],
+            "orders": [orders for orders, _ in by_day.values()],
+            "revenue": [float(revenue) for _, revenue in by_day.values()],
+        },
+        "categories": {
+            "labels": [category for category, _ in categories],
+            "revenue": [float(revenue) for _, revenue in categories],
+        },
+        "top_products": top_products,
+    }
@@ -0,0 +1,53 @@
+# Generated by Django 6.0.1 on 2026-10-17 11:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def blank_references_to_null(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    Order.objects.filter(payment_reference="").update(payment_reference=None)
+
+
+def null_references_to_blank(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    Order.objects.filter(payment_reference__isnull=True).update(payment_reference="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_paystackwebhookevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='payment_reference',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.RunPython(blank_references_to_null, null_references_to_blank),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(fields=('payment_reference',), name='order_payment_reference_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'awaiting_payment'])), fields=['created_at'], name='order_open_created_idx'),
+        ),
+    ]
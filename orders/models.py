@@ -22,7 +22,13 @@ class Order(models.Model):
         ("pay_on_delivery", "Pay on Delivery"),
     )
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")
+    # Indexed through the leading column of order_user_created_idx.
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="orders",
+        db_index=False,
+    )
     full_name = models.CharField(max_length=150, blank=True)
     phone = models.CharField(max_length=20, blank=True)
     delivery_method = models.CharField(
@@ -38,11 +44,35 @@ class Order(models.Model):
     delivery_address = models.TextField(blank=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
-    payment_reference = models.CharField(max_length=100, blank=True)
+    # NULL rather than "" when unset so the unique constraint ignores it.
+    payment_reference = models.CharField(max_length=100, blank=True, null=True)
     payment_verified_at = models.DateTimeField(blank=True, null=True)
     stock_deducted = models.BooleanField(default=False)
+    # Bumped by every status change; see orders.transitions.
+    version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["payment_reference"],
+                name="order_payment_reference_uniq",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="order_user_created_idx"),
+            # Keyset order of the admin order list, alone and per status.
+            models.Index(fields=["-created_at", "-id"], name="order_created_idx"),
+            models.Index(fields=["status", "-created_at", "-id"], name="order_status_created_idx"),
+            models.Index(fields=["delivery_method", "-created_at", "-id"], name="order_delivery_created_idx"),
+            # Unpaid orders are a small, hot subset scanned by age.
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(status__in=["pending", "awaiting_payment"]),
+                name="order_open_created_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.user.email}"
 
@@ -59,3 +89,153 @@ class OrderItem(models.Model):
     @property
     def line_total(self):
         return self.price * self.quantity
+
+
+class OrderStatusChange(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="status_history")
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    version = models.PositiveIntegerField()
+    source = models.CharField(max_length=50)
+    changed_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        blank=True,
+        null=True,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Order #{self.order_id}: {self.from_status} -> {self.to_status}"
+
+
+class DailyOrderStats(models.Model):
+    """Orders placed on ``date`` that are now in ``status``; see orders.metrics."""
+
+    date = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["date", "status"], name="daily_order_stats_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.status}: {self.orders}"
+
+
+class DailyProductSales(models.Model):
+    """Units and revenue of completed orders placed on ``date``, per product."""
+
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    category = models.CharField(max_length=50)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["date", "product"], name="daily_product_sales_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_id}: {self.units}"
+
+
+class PaystackWebhookEvent(models.Model):
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("processed", "Processed"),
+        ("ignored", "Ignored"),
+        ("rejected", "Rejected"),
+    )
+
+    reference = models.CharField(max_length=100)
+    event = models.CharField(max_length=50)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    error = models.CharField(max_length=255, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["reference", "event"],
+                name="unique_paystack_event",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "received_at"], name="webhook_event_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.event} {self.reference}"
+
+
+class Cart(models.Model):
+    # Anonymous carts have no user and are found through the session.
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="cart",
+        blank=True,
+        null=True,
+    )
+    item_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        owner = self.user.email if self.user_id else "anonymous"
+        return f"Cart #{self.id} ({owner})"
+
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cart", "product"], name="unique_cart_product"),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} x{self.quantity}"
+
+
+class StockReservation(models.Model):
+    STATUS_CHOICES = (
+        ("active", "Active"),
+        ("converted", "Converted"),
+        ("released", "Released"),
+    )
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="reservations")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="reservations")
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="active")
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Covers the "active holds per product" sum behind available stock.
+            models.Index(
+                fields=["product", "expires_at", "quantity"],
+                condition=models.Q(status="active"),
+                name="reservation_active_idx",
+            ),
+            models.Index(
+                fields=["expires_at"],
+                condition=models.Q(status="active"),
+                name="reservation_expiry_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} x{self.quantity} for order #{self.order_id}"
@@ -0,0 +1,176 @@
+import logging
+import threading
+import time
+from decimal import Decimal
+import requests
+from django.conf import settings
+from core.utils import parse_int
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+def payment_mismatch(order, data):
+    """
+    Compare a Paystack transaction with the order it claims to pay for.
+
+    Returns an error message when the amount or metadata do not match,
+    otherwise ``None``.
+    """
+    if data.get("amount") != int(order.total_amount * Decimal("100")):
+        return "Payment amount mismatch."
+    metadata = data.get("metadata") or {}
+    meta_order_id = parse_int(metadata.get("order_id"))
+    meta_user_id = parse_int(metadata.get("user_id"))
+    if meta_order_id != order.id or meta_user_id != order.user_id:
+        return "Payment metadata mismatch."
+    return None
+
+
+def flag_unpayable_payment(order, source):
+    """
+    Log a verified payment for an order that can no longer complete.
+
+    Paystack has already charged the customer, so staff must refund or
+    reopen the order by hand. Returns the error recorded for the payment.
+    """
+    error = f"Order is {order.status}; payment needs manual review."
+    logger.error(
+        "Payment %s for order #%s received via %s: %s",
+        order.payment_reference,
+        order.pk,
+        source,
+        error,
+    )
+    return error
+
+
+class PaystackUnavailable(requests.RequestException):
+    """Raised without contacting Paystack when the client refuses a call."""
+
+
+class PaystackClient:
+    """
+    Shared Paystack API client.
+
+    One keep-alive session with a bounded connection pool is reused by every
+    request. Calls are capped by a semaphore (the bulkhead) so a slow Paystack
+    cannot occupy every worker thread, and a circuit breaker fails fast after
+    repeated errors until ``PAYSTACK_BREAKER_COOLDOWN`` has passed. Refused
+    and failed calls raise ``requests.RequestException`` subclasses, so the
+    views keep their existing error handling.
+    """
+
+    def __init__(self):
+        self.base_url = getattr(settings, "PAYSTACK_BASE_URL", "https://api.paystack.co").rstrip("/")
+        self.connect_timeout = getattr(settings, "PAYSTACK_CONNECT_TIMEOUT", 3.05)
+        self.read_timeout = getattr(settings, "PAYSTACK_READ_TIMEOUT", 10)
+        self.failure_threshold = getattr(settings, "PAYSTACK_BREAKER_THRESHOLD", 5)
+        self.cooldown = getattr(settings, "PAYSTACK_BREAKER_COOLDOWN", 30)
+        self.acquire_timeout = getattr(settings, "PAYSTACK_QUEUE_TIMEOUT", 2)
+        max_concurrent = getattr(settings, "PAYSTACK_MAX_CONCURRENT", 10)
+
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._stats = {}
+
+        self.session = requests.Session()
+        # Only verify is retried: initialize creates a transaction and must
+        # not be sent twice. PAYSTACK_VERIFY_RETRIES caps every kind of
+        # failure together.
+        retry = Retry(
+            total=getattr(settings, "PAYSTACK_VERIFY_RETRIES", 2),
+            backoff_factor=0.2,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=max_concurrent,
+            max_retries=retry,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _headers(self):
+        return {"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"}
+
+    def _allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            # Half-open: let a single trial call through.
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def _record(self, name, started, ok):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            stats = self._stats.setdefault(
+                name,
+                {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0},
+            )
+            stats["calls"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            self._trial_in_flight = False
+            if ok:
+                self._failures = 0
+                self._opened_at = None
+            else:
+                stats["errors"] += 1
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    self._opened_at = time.monotonic()
+
+    def _call(self, name, method, path, **kwargs):
+        if not self._allow():
+            raise PaystackUnavailable("Paystack circuit breaker is open.")
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._trial_in_flight = False
+            raise PaystackUnavailable("Too many concurrent Paystack calls.")
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.request(
+                method,
+                f"{self.base_url}{path}",
+                headers=self._headers(),
+                timeout=(self.connect_timeout, self.read_timeout),
+                **kwargs,
+            )
+            ok = response.status_code < 500
+            return response.json()
+        finally:
+            self._slots.release()
+            self._record(name, started, ok)
+
+    def initialize_transaction(self, payload):
+        return self._call("initialize", "POST", "/transaction/initialize", json=payload)
+
+    def verify_transaction(self, reference):
+        return self._call("verify", "GET", f"/transaction/verify/{reference}")
+
+    def stats(self):
+        """Per-call counters: calls, errors, total/max/avg latency in ms."""
+        with self._lock:
+            snapshot = {}
+            for name, stats in self._stats.items():
+                snapshot[name] = dict(stats)
+                snapshot[name]["avg_ms"] = (
+                    stats["total_ms"] / stats["calls"] if stats["calls"] else 0.0
+                )
+            return snapshot
+
+
+paystack = PaystackClient()
@@ -0,0 +1,83 @@
+from datetime import datetime, time, timedelta
+from django.db.models import Count, Sum
+from django.template.loader import get_template
+from django.utils import timezone
+from .export import encoded, export_records
+from .models import Order, OrderItem
+
+# Orders still to be delivered; cancelled and failed ones are left out
+# unless a status is asked for explicitly.
+PICKABLE_STATUSES = ("pending", "awaiting_payment", "completed")
+
+
+def orders_to_pick(day=None, delivery_method=None, status=None):
+    """Orders placed on the local date ``day`` (any day if ``None``) to pick."""
+    orders = Order.objects.all()
+    if day:
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        orders = orders.filter(created_at__gte=start, created_at__lt=start + timedelta(days=1))
+    if delivery_method:
+        orders = orders.filter(delivery_method=delivery_method)
+    if status:
+        return orders.filter(status=status)
+    return orders.filter(status__in=PICKABLE_STATUSES)
+
+
+def pick_list(orders):
+    """
+    Total quantity of each product across ``orders``, in one grouped query.
+
+    Rows are ``{"product_id", "name", "category", "quantity", "orders"}``
+    sorted by category and name, the order the farm team walks the stock.
+    """
+    rows = (
+        OrderItem.objects.filter(order__in=orders.order_by().values("pk"))
+        .values("product_id", "product__name", "product__category")
+        .annotate(quantity=Sum("quantity"), orders=Count("order_id", distinct=True))
+        .order_by("product__category", "product__name")
+    )
+    return [
+        {
+            "product_id": row["product_id"],
+            "name": row["product__name"],
+            "category": row["product__category"],
+            "quantity": row["quantity"],
+            "orders": row["orders"],
+        }
+        for row in rows
+    ]
+
+
+def packing_sheet_lines(orders, title="", chunk_size=200):
+    """
+    One printable HTML document: the pick list, then a sheet per order.
+
+    The head is rendered first and each order's sheet as its rows arrive
+    from ``export_records``, so the document streams with two queries per
+    ``chunk_size`` orders and the browser can print (or save as PDF) a page
+    per order.
+    """
+    sheet = get_template("orders/packing_sheet.html")
+    yield get_template("orders/packing_sheets_head.html").render(
+        {
+            "title": title,
+            "generated_at": timezone.localtime(),
+            "pick_list": pick_list(orders),
+        }
+    )
+    delivery = dict(Order.DELIVERY_CHOICES)
+    payment = dict(Order.PAYMENT_METHOD_CHOICES)
+    for record in export_records(orders, chunk_size=chunk_size):
+        yield sheet.render(
+            {
+                "order": record,
+                "placed": record["created_at"][:16].replace("T", " "),
+                "delivery": delivery.get(record["delivery_method"], record["delivery_method"]),
+                "payment": payment.get(record["payment_method"], record["payment_method"]),
+            }
+        )
+    yield get_template("orders/packing_sheets_foot.html").render({})
+
+
+def packing_sheets(orders, title="", chunk_size=200):
+    return encoded(packing_sheet_lines(orders, title=title, chunk_size=chunk_size))
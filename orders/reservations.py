@@ -0,0 +1,203 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Sum
+from django.utils import timezone
+from products.models import Product
+from .models import OrderItem, StockReservation
+
+
+class InsufficientStock(Exception):
+    """Raised when an order asks for more than the unreserved stock."""
+
+    def __init__(self, shortfalls):
+        self.shortfalls = shortfalls
+        names = ", ".join(line["product"].name for line in shortfalls)
+        super().__init__(f"Insufficient stock for: {names}")
+
+
+def reservation_ttl(payment_method):
+    if payment_method == "pay_on_delivery":
+        minutes = getattr(settings, "STOCK_RESERVATION_TTL_PAY_ON_DELIVERY", 72 * 60)
+    else:
+        minutes = getattr(settings, "STOCK_RESERVATION_TTL", 30)
+    return timedelta(minutes=minutes)
+
+
+def reserved_quantities(product_ids):
+    """Units held by unexpired reservations, as ``{product_id: quantity}``."""
+    rows = (
+        StockReservation.objects.filter(
+            status="active",
+            product_id__in=product_ids,
+            expires_at__gt=timezone.now(),
+        )
+        .values("product_id")
+        .annotate(reserved=Sum("quantity"))
+        .order_by()
+    )
+    return {row["product_id"]: row["reserved"] for row in rows}
+
+
+def available_stock(products):
+    """Stock minus active holds for already loaded products, by product id."""
+    reserved = reserved_quantities([product.id for product in products])
+    return {
+        product.id: max(product.stock - reserved.get(product.id, 0), 0)
+        for product in products
+    }
+
+
+def reserve_stock(order, order_items):
+    """
+    Hold stock for every line of a new order until it is paid or expires.
+
+    Must run inside the transaction that creates the order: the products
+    are locked so concurrent checkouts see each other's holds. Raises
+    ``InsufficientStock`` if any line cannot be held, including lines whose
+    product was deleted since the cart was loaded.
+    """
+    lines, ordered = {}, {}
+    for item in order_items:
+        lines[item.product_id] = lines.get(item.product_id, 0) + item.quantity
+        ordered[item.product_id] = item.product
+
+    products = list(
+        Product.objects.select_for_update()
+        .filter(pk__in=lines.keys())
+        .only("name", "stock")
+        .order_by("pk")
+    )
+    available = available_stock(products)
+    shortfalls = [
+        {
+            "product": ordered[product_id],
+            "requested": quantity,
+            "available": available.get(product_id, 0),
+        }
+        for product_id, quantity in lines.items()
+        if quantity > available.get(product_id, 0)
+    ]
+    if shortfalls:
+        raise InsufficientStock(shortfalls)
+
+    expires_at = timezone.now() + reservation_ttl(order.payment_method)
+    StockReservation.objects.bulk_create(
+        [
+            StockReservation(
+                order=order,
+                product_id=product_id,
+                quantity=quantity,
+                expires_at=expires_at,
+            )
+            for product_id, quantity in lines.items()
+        ]
+    )
+
+
+def reserve_stock_for_orders(orders):
+    """
+    Hold stock again for the ``orders`` (a queryset) that have no active holds.
+
+    Used when failed orders go back to awaiting payment. The orders are
+    locked and then their products, both in primary-key order as on the
+    payment paths. Orders are held whole, in id order, while stock lasts,
+    for as long as pay-on-delivery orders; the rest get no holds and their
+    short lines are returned as ``{"order_id", "product", "requested",
+    "available"}`` dicts.
+    """
+    now = timezone.now()
+    active = StockReservation.objects.filter(
+        order=OuterRef("pk"),
+        status="active",
+        expires_at__gt=now,
+    )
+    with transaction.atomic(savepoint=False):
+        order_ids = list(
+            orders.select_for_update()
+            .filter(~Exists(active))
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        lines = defaultdict(dict)
+        rows = (
+            OrderItem.objects.filter(order_id__in=order_ids)
+            .values("order_id", "product_id")
+            .annotate(quantity=Sum("quantity"))
+            .order_by("order_id", "product_id")
+        )
+        for row in rows:
+            lines[row["order_id"]][row["product_id"]] = row["quantity"]
+        if not lines:
+            return []
+
+        products = {
+            product.pk: product
+            for product in Product.objects.select_for_update()
+            .filter(pk__in={pk for order_lines in lines.values() for pk in order_lines})
+            .only("name", "stock")
+            .order_by("pk")
+        }
+        available = available_stock(products.values())
+        expires_at = now + reservation_ttl("pay_on_delivery")
+        holds, shortfalls = [], []
+        for order_id, order_lines in lines.items():
+            short = [
+                {
+                    "order_id": order_id,
+                    "product": products[product_id],
+                    "requested": quantity,
+                    "available": available[product_id],
+                }
+                for product_id, quantity in order_lines.items()
+                if quantity > available[product_id]
+            ]
+            if short:
+                shortfalls.extend(short)
+                continue
+            for product_id, quantity in order_lines.items():
+                available[product_id] -= quantity
+                holds.append(
+                    StockReservation(
+                        order_id=order_id,
+                        product_id=product_id,
+                        quantity=quantity,
+                        expires_at=expires_at,
+                    )
+                )
+        StockReservation.objects.bulk_create(holds)
+    return shortfalls
+
+
+def convert_reservations(order_ids):
+    """Mark the holds of paid orders as turned into real stock deductions."""
+    return StockReservation.objects.filter(
+        order_id__in=order_ids,
+        status="active",
+    ).update(status="converted")
+
+
+def release_reservations(order_ids):
+    """Give back the stock held for orders that will not be paid."""
+    return StockReservation.objects.filter(
+        order_id__in=order_ids,
+        status="active",
+    ).update(status="released")
+
+
+def release_expired(chunk_size=1000):
+    """Release one chunk of expired holds; returns how many were released."""
+    ids = list(
+        StockReservation.objects.filter(
+            status="active",
+            expires_at__lte=timezone.now(),
+        )
+        .order_by("expires_at")
+        .values_list("id", flat=True)[:chunk_size]
+    )
+    if not ids:
+        return 0
+    return StockReservation.objects.filter(id__in=ids, status="active").update(
+        status="released"
+    )
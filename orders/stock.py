@@ -0,0 +1,141 @@
+import logging
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Sum, When
+from products.catalog import catalog_changed
+from products.models import Product
+from .models import Order, OrderItem
+from .reservations import convert_reservations
+
+logger = logging.getLogger(__name__)
+
+
+def _order_lines(order_ids):
+    """``(order_id, product_id, quantity)`` for the orders, summed in the database."""
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values("order_id", "product_id")
+        .annotate(quantity=Sum("quantity"))
+        .order_by("order_id", "product_id")
+    )
+    return [(row["order_id"], row["product_id"], row["quantity"]) for row in rows]
+
+
+def _decrement(lines):
+    """Apply ``{product_id: quantity}`` as one conditional UPDATE."""
+    # A queryset update sends no post_save, so retire the cached grid here.
+    catalog_changed()
+    condition = Q()
+    for product_id, quantity in lines.items():
+        condition |= Q(pk=product_id, stock__gte=quantity)
+    return Product.objects.filter(condition).update(
+        stock=Case(
+            *[
+                When(pk=product_id, then=F("stock") - quantity)
+                for product_id, quantity in lines.items()
+            ],
+            default=F("stock"),
+            output_field=PositiveIntegerField(),
+        )
+    )
+
+
+def _fill(lines):
+    """
+    Take ``lines`` out of stock with one UPDATE; returns what did not fit.
+
+    The products are locked in primary-key order first. Lines are filled in
+    order-id order while stock lasts, so when a product runs short the
+    earlier orders get it and only the later lines are reported.
+    """
+    products = {
+        product.pk: product
+        for product in Product.objects.select_for_update()
+        .filter(pk__in={product_id for _, product_id, _ in lines})
+        .only("name", "stock")
+        .order_by("pk")
+    }
+    remaining = {pk: product.stock for pk, product in products.items()}
+    fillable = defaultdict(int)
+    shortfalls = []
+    for order_id, product_id, quantity in lines:
+        if product_id not in products:
+            continue
+        if remaining[product_id] >= quantity:
+            remaining[product_id] -= quantity
+            fillable[product_id] += quantity
+        else:
+            shortfalls.append(
+                {
+                    "order_id": order_id,
+                    "product": products[product_id],
+                    "requested": quantity,
+                    "available": remaining[product_id],
+                }
+            )
+    if fillable:
+        _decrement(fillable)
+    return shortfalls
+
+
+def _log_shortfalls(shortfalls):
+    for shortfall in shortfalls:
+        logger.warning(
+            "Order #%s short on %s: requested %s, available %s",
+            shortfall["order_id"],
+            shortfall["product"].name,
+            shortfall["requested"],
+            shortfall["available"],
+        )
+
+
+def deduct_stock(order):
+    """
+    Deduct stock for every line of an order exactly once.
+
+    ``Order.stock_deducted`` is claimed with a conditional UPDATE, the
+    affected products are locked in primary-key order and all lines are
+    decremented by a single ``stock = stock - qty WHERE stock >= qty``
+    statement, so the query count does not grow with the order size and
+    concurrent callers cannot oversell. The order's stock reservations are
+    converted in the same transaction. Lines that cannot be filled are left
+    untouched and returned as ``{"order_id", "product", "requested",
+    "available"}`` dicts.
+    """
+    with transaction.atomic():
+        claimed = Order.objects.filter(pk=order.pk, stock_deducted=False).update(
+            stock_deducted=True
+        )
+        order.stock_deducted = True
+        if not claimed:
+            return []
+        convert_reservations([order.pk])
+        lines = _order_lines([order.pk])
+        shortfalls = _fill(lines) if lines else []
+    _log_shortfalls(shortfalls)
+    return shortfalls
+
+
+def deduct_stock_for_orders(order_ids):
+    """
+    ``deduct_stock`` for many orders with a fixed number of queries.
+
+    The orders not yet deducted are locked and claimed with one UPDATE,
+    their lines summed per order and product in one query and every product
+    decremented by one aggregated UPDATE.
+    """
+    with transaction.atomic(savepoint=False):
+        claimed = list(
+            Order.objects.select_for_update()
+            .filter(pk__in=order_ids, stock_deducted=False)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        if not claimed:
+            return []
+        Order.objects.filter(pk__in=claimed).update(stock_deducted=True)
+        convert_reservations(claimed)
+        lines = _order_lines(claimed)
+        shortfalls = _fill(lines) if lines else []
+    _log_shortfalls(shortfalls)
+    return shortfalls
@@ -1,3 +1,505 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from core.pagination import keyset_page
+from products.models import Product
+from .analytics import build_snapshot, load_snapshot, summarize, top_products
+from .checkout import place_order
+from .export import export_records, export_stream
+from .management.commands.reconcile_paystack_orders import RateLimiter
+from .metrics import dashboard_metrics
+from .models import DailyOrderStats, DailyProductSales, Order, OrderItem, PaystackWebhookEvent
+from .paystack import PaystackClient, PaystackUnavailable
+from .picking import orders_to_pick, pick_list
+from .reservations import InsufficientStock, available_stock, release_expired
+from .stock import deduct_stock_for_orders
+from .transitions import can_transition, transition_order, transition_orders
+from .webhooks import process_webhook_events
 
-# Create your tests here.
+
+class PaystackBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.paystack = PaystackClient()
+        self.paystack.failure_threshold = 2
+        self.paystack.cooldown = 30
+        self.clock = 1000.0
+        patcher = mock.patch("orders.paystack.time.monotonic", side_effect=lambda: self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_verify_retries_follow_the_setting(self):
+        with self.settings(PAYSTACK_VERIFY_RETRIES=5):
+            retry = PaystackClient().session.get_adapter("https://api.paystack.co").max_retries
+        self.assertEqual(retry.total, 5)
+        self.assertEqual((retry.connect, retry.read, retry.status), (None, None, None))
+
+    def respond(self, status_code):
+        response = mock.Mock(status_code=status_code)
+        response.json.return_value = {"status": status_code < 500}
+        return mock.patch.object(self.paystack.session, "request", return_value=response)
+
+    def test_half_open_breaker_lets_one_trial_through(self):
+        with self.respond(503) as request:
+            self.paystack.verify_transaction("ref")
+            self.paystack.verify_transaction("ref")
+            with self.assertRaises(PaystackUnavailable):
+                self.paystack.verify_transaction("ref")
+        self.assertEqual(request.call_count, 2)
+
+        self.clock += 31
+        self.assertTrue(self.paystack._allow())
+        # Other callers are refused while the trial is in flight.
+        self.assertFalse(self.paystack._allow())
+        self.paystack._record("verify", 0, False)
+        with self.assertRaises(PaystackUnavailable):
+            self.paystack.verify_transaction("ref")
+
+        self.clock += 31
+        with self.respond(200):
+            self.assertEqual(self.paystack.verify_transaction("ref"), {"status": True})
+            self.assertEqual(self.paystack.verify_transaction("ref"), {"status": True})
+
+
+class RateLimiterTests(SimpleTestCase):
+    def test_calls_are_spaced_by_the_rate(self):
+        clock = [100.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(round(seconds, 3))
+            clock[0] += seconds
+
+        with mock.patch("orders.management.commands.reconcile_paystack_orders.time") as fake_time:
+            fake_time.monotonic.side_effect = lambda: clock[0]
+            fake_time.sleep.side_effect = sleep
+            limiter = RateLimiter(4)
+            for _ in range(3):
+                limiter.wait()
+            clock[0] += 10
+            limiter.wait()
+        self.assertEqual(sleeps, [0.25, 0.25])
+
+
+class OrderQueryPlanTests(TestCase):
+    """The hot order lookups must stay index scans as the table grows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create(
+            [User(username=f"customer{index}@example.com") for index in range(50)]
+        )
+        statuses = ["completed"] * 18 + ["pending", "awaiting_payment"]
+        Order.objects.bulk_create(
+            [
+                Order(
+                    user=cls.users[index % len(cls.users)],
+                    status=statuses[index % len(statuses)],
+                    delivery_method="pickup" if index % 10 == 0 else "delivery",
+                    payment_reference=f"ref-{index:05d}",
+                    total_amount=1000,
+                )
+                for index in range(2000)
+            ]
+        )
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE orders_order")
+
+    def assertUsesIndex(self, queryset, *index_names):
+        plan = queryset.explain()
+        self.assertTrue(
+            any(name in plan for name in index_names),
+            f"Expected one of {index_names} in plan:\n{plan}",
+        )
+        self.assertNotIn("Seq Scan", plan)
+        self.assertNotRegex(plan, r"\bSCAN orders_order\b")
+
+    def test_payment_reference_lookup_uses_unique_index(self):
+        self.assertUsesIndex(
+            Order.objects.filter(payment_reference="ref-01234"),
+            "order_payment_reference_uniq",
+            "sqlite_autoindex_orders_order",
+        )
+
+    def test_order_history_uses_user_created_index(self):
+        self.assertUsesIndex(
+            Order.objects.filter(user=self.users[7]).order_by("-created_at"),
+            "order_user_created_idx",
+        )
+
+    def test_status_count_uses_status_index(self):
+        self.assertUsesIndex(
+            Order.objects.filter(status="pending").values("id"),
+            "order_status_created_idx",
+            "order_open_created_idx",
+        )
+
+    def test_stale_open_orders_use_index(self):
+        cutoff = timezone.now() - timedelta(hours=1)
+        self.assertUsesIndex(
+            Order.objects.filter(
+                status__in=["pending", "awaiting_payment"],
+                created_at__lt=cutoff,
+            ),
+            "order_open_created_idx",
+            "order_status_created_idx",
+        )
+
+    def test_deep_admin_list_page_uses_keyset_index(self):
+        boundary = Order.objects.order_by("-created_at", "-id")[1500]
+        page = Order.objects.filter(
+            Q(created_at__lte=boundary.created_at),
+            Q(created_at__lt=boundary.created_at)
+            | Q(created_at=boundary.created_at, id__lt=boundary.id),
+        ).order_by("-created_at", "-id")[:11]
+        self.assertUsesIndex(page, "order_created_idx")
+
+    def test_delivery_filter_uses_delivery_index(self):
+        page = Order.objects.filter(delivery_method="pickup").order_by("-created_at", "-id")[:11]
+        self.assertUsesIndex(page, "order_delivery_created_idx")
+
+    def test_keyset_pages_cover_every_order_once(self):
+        queryset = Order.objects.filter(status="completed")
+        seen = []
+        page = keyset_page(queryset, ("-created_at", "-id"), 250)
+        while True:
+            seen.extend(order.id for order in page)
+            if not page.has_next:
+                break
+            page = keyset_page(queryset, ("-created_at", "-id"), 250, after=page.next_cursor)
+        self.assertEqual(seen, list(queryset.order_by("-created_at", "-id").values_list("id", flat=True)))
+
+        back = keyset_page(queryset, ("-created_at", "-id"), 250, before=page.previous_cursor)
+        self.assertEqual([order.id for order in back], seen[-len(page) - 250 : -len(page)])
+
+    def test_blank_references_do_not_collide(self):
+        user = self.users[0]
+        Order.objects.create(user=user)
+        Order.objects.create(user=user)
+        self.assertEqual(Order.objects.filter(payment_reference__isnull=True).count(), 2)
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="reserve@example.com")
+        self.ram = Product.objects.create(name="Ram", category="Cattle", price=100, stock=3)
+
+    def checkout(self, quantity):
+        items = [{"product": self.ram, "quantity": quantity}]
+        return place_order(self.user, items, Decimal(100 * quantity), "delivery", "paystack", "")
+
+    def test_checkout_beyond_the_unreserved_stock_saves_nothing(self):
+        self.checkout(2)
+        with self.assertRaises(InsufficientStock) as raised:
+            self.checkout(2)
+        self.assertEqual(
+            [
+                (line["product"].name, line["requested"], line["available"])
+                for line in raised.exception.shortfalls
+            ],
+            [("Ram", 2, 1)],
+        )
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(available_stock([self.ram]), {self.ram.pk: 1})
+
+    def test_product_deleted_during_checkout_is_a_shortfall(self):
+        Product.objects.filter(pk=self.ram.pk).delete()
+        with self.assertRaises(InsufficientStock) as raised:
+            self.checkout(1)
+        self.assertEqual(
+            [(line["product"].name, line["requested"], line["available"]) for line in raised.exception.shortfalls],
+            [("Ram", 1, 0)],
+        )
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_expired_holds_give_the_stock_back(self):
+        order, _ = self.checkout(3)
+        order.reservations.update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(available_stock([self.ram]), {self.ram.pk: 3})
+        self.assertEqual(release_expired(), 1)
+        self.assertEqual(order.reservations.get().status, "released")
+
+
+class WebhookPaymentTests(TestCase):
+    def test_payment_for_a_cancelled_order_is_rejected_for_review(self):
+        user = User.objects.create(username="late@example.com")
+        order = Order.objects.create(
+            user=user, status="cancelled", total_amount=50, payment_reference="ref-late"
+        )
+        PaystackWebhookEvent.objects.create(
+            reference="ref-late",
+            event="charge.success",
+            payload={
+                "data": {
+                    "reference": "ref-late",
+                    "amount": 5000,
+                    "metadata": {"order_id": order.pk, "user_id": user.pk},
+                }
+            },
+        )
+        with self.assertLogs("orders.paystack", "ERROR"):
+            self.assertEqual(process_webhook_events(), 1)
+        event = PaystackWebhookEvent.objects.get()
+        self.assertEqual(
+            (event.status, event.error),
+            ("rejected", "Order is cancelled; payment needs manual review."),
+        )
+        self.assertEqual(Order.objects.get(pk=order.pk).status, "cancelled")
+
+    def test_verified_payment_for_a_cancelled_order_is_flagged(self):
+        user = User.objects.create_user("late@example.com", password="x")
+        order = Order.objects.create(
+            user=user, status="cancelled", total_amount=50, payment_reference="ref-late"
+        )
+        self.client.force_login(user)
+        data = {
+            "status": True,
+            "data": {
+                "status": "success",
+                "amount": 5000,
+                "metadata": {"order_id": order.pk, "user_id": user.pk},
+            },
+        }
+        with mock.patch("orders.views.paystack.verify_transaction", return_value=data):
+            with self.assertLogs("orders.paystack", "ERROR") as logs:
+                response = self.client.get(reverse("orders:paystack_verify"), {"reference": "ref-late"})
+        self.assertRedirects(response, reverse("orders:payment_failed"), fetch_redirect_response=False)
+        self.assertIn("ref-late", logs.output[0])
+
+
+class OrderTransitionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="buyer@example.com")
+        self.order = Order.objects.create(
+            user=self.user,
+            status="pending",
+            payment_reference="ref-transition",
+            total_amount=1000,
+        )
+
+    def test_transition_records_history_and_bumps_version(self):
+        self.assertTrue(transition_order(self.order, "completed", source="test"))
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.version), ("completed", 1))
+        change = self.order.status_history.get()
+        self.assertEqual(
+            (change.from_status, change.to_status, change.version, change.source),
+            ("pending", "completed", 1, "test"),
+        )
+
+    def test_stale_copy_cannot_overwrite_a_newer_status(self):
+        stale = Order.objects.get(pk=self.order.pk)
+        self.assertTrue(transition_order(self.order, "completed", source="webhook"))
+        with self.assertNumQueries(1):
+            self.assertFalse(transition_order(stale, "failed", source="verify"))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "completed")
+        self.assertEqual(self.order.status_history.count(), 1)
+
+    def test_illegal_transition_is_refused(self):
+        self.assertTrue(transition_order(self.order, "cancelled", source="test"))
+        self.assertFalse(transition_order(self.order, "completed", source="test"))
+        self.assertFalse(can_transition("completed", "pending"))
+
+    def test_bulk_transition_skips_final_orders(self):
+        done = Order.objects.create(user=self.user, status="completed", total_amount=1000)
+        more = Order.objects.bulk_create(
+            [Order(user=self.user, status="pending", total_amount=1000) for _ in range(5)]
+        )
+        ids = [self.order.pk, done.pk] + [order.pk for order in more]
+        # Lock, UPDATE and history insert; the rollups follow the commit.
+        with self.assertNumQueries(3):
+            moved = transition_orders(ids, "cancelled", source="sweeper")
+        self.assertEqual(moved, [self.order.pk] + [order.pk for order in more])
+        self.assertEqual(Order.objects.get(pk=done.pk).status, "completed")
+
+
+class BulkStockDeductionTests(TestCase):
+    def test_one_aggregated_decrement_fills_earlier_orders_first(self):
+        user = User.objects.create(username="bulk@example.com")
+        lamb = Product.objects.create(name="Ram", category="Cattle", price=100, stock=5)
+        eggs = Product.objects.create(name="Catfish", category="Fish", price=10, stock=50)
+        orders = Order.objects.bulk_create(
+            [Order(user=user, status="completed", total_amount=100) for _ in range(3)]
+        )
+        OrderItem.objects.bulk_create(
+            [OrderItem(order=order, product=lamb, quantity=2, price=100) for order in orders]
+            + [OrderItem(order=order, product=eggs, quantity=10, price=10) for order in orders]
+        )
+        ids = [order.pk for order in orders]
+        # Claim read and UPDATE, reservations, lines, product lock, decrement.
+        with self.assertNumQueries(6):
+            shortfalls = deduct_stock_for_orders(ids)
+        self.assertEqual(
+            [(line["order_id"], line["product"].name, line["available"]) for line in shortfalls],
+            [(orders[2].pk, "Ram", 1)],
+        )
+        self.assertEqual(Product.objects.get(pk=lamb.pk).stock, 1)
+        self.assertEqual(Product.objects.get(pk=eggs.pk).stock, 20)
+        self.assertEqual(deduct_stock_for_orders(ids), [])
+        self.assertEqual(Product.objects.get(pk=eggs.pk).stock, 20)
+
+
+class RollupLockOrderTests(TestCase):
+    def test_rollups_are_written_after_the_transactions_that_lock_stock(self):
+        user = User.objects.create(username="rollup@example.com")
+        hen = Product.objects.create(name="Hen", category="Poultry", price=10, stock=10)
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks() as callbacks:
+                # Checkout, then the webhook's transition and deduction.
+                order, _ = place_order(
+                    user, [{"product": hen, "quantity": 2}], Decimal("20"), "delivery", "paystack", "Farm road"
+                )
+                deduct_stock_for_orders(transition_orders([order.pk], "completed", source="test"))
+        self.assertEqual(Product.objects.get(pk=hen.pk).stock, 8)
+        self.assertFalse(
+            [query for query in queries.captured_queries if "orders_daily" in query["sql"]]
+        )
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            dict(DailyOrderStats.objects.values_list("status", "orders")),
+            {"pending": 0, "completed": 1},
+        )
+        self.assertEqual(DailyProductSales.objects.get(product=hen).units, 2)
+
+
+class DashboardMetricsTests(TestCase):
+    def test_totals_trend_and_sales_come_from_two_queries(self):
+        today = timezone.localdate()
+        hen = Product.objects.create(name="Hen", category="Poultry", price=10, stock=10)
+        ram = Product.objects.create(name="Ram", category="Cattle", price=100, stock=10)
+        DailyOrderStats.objects.bulk_create(
+            [
+                DailyOrderStats(date=today, status="completed", orders=2, revenue=120),
+                DailyOrderStats(date=today, status="pending", orders=1, revenue=10),
+                DailyOrderStats(date=today - timedelta(days=90), status="completed", orders=5, revenue=500),
+            ]
+        )
+        DailyProductSales.objects.bulk_create(
+            [
+                DailyProductSales(date=today, product=hen, category="Poultry", units=2, revenue=20),
+                DailyProductSales(date=today - timedelta(days=1), product=ram, category="Cattle", units=1, revenue=100),
+            ]
+        )
+        with self.assertNumQueries(2):
+            metrics = dashboard_metrics()
+        self.assertEqual(
+            (metrics["total_orders"], metrics["pending_orders"], metrics["completed_orders"]),
+            (8, 1, 7),
+        )
+        self.assertEqual(metrics["total_revenue"], Decimal("620"))
+        self.assertEqual(metrics["trend"]["orders"][-1], 3)
+        self.assertEqual(metrics["trend"]["revenue"][-1], 120.0)
+        self.assertEqual(metrics["categories"], {"labels": ["Cattle", "Poultry"], "revenue": [100.0, 20.0]})
+        self.assertEqual([row["product__name"] for row in metrics["top_products"]], ["Ram", "Hen"])
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="buyer", email="buyer@example.com", first_name="Ada")
+        hen = Product.objects.create(name="Hen", category="Poultry", price=10, stock=99)
+        self.orders = Order.objects.bulk_create(
+            [
+                Order(user=user, status="completed", total_amount=20, payment_reference=f"exp-{index}")
+                for index in range(5)
+            ]
+        )
+        self.orders[0].delivery_address = '=HYPERLINK("http://evil.example","x")'
+        self.orders[0].phone = "+2348000000000"
+        self.orders[0].save()
+        OrderItem.objects.bulk_create(
+            [OrderItem(order=order, product=hen, quantity=2, price=10) for order in self.orders]
+        )
+
+    def export(self, export_format, compress=False):
+        data = b"".join(export_stream(Order.objects.all(), export_format, compress=compress))
+        return (gzip.decompress(data) if compress else data).decode("utf-8")
+
+    def test_csv_round_trip_neutralises_formulas(self):
+        rows = list(csv.DictReader(io.StringIO(self.export("csv"))))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["delivery_address"], '\'=HYPERLINK("http://evil.example","x")')
+        self.assertEqual(rows[0]["phone"], "'+2348000000000")
+        self.assertEqual(rows[1]["items"], "Hen x2 @ 10.00")
+        self.assertEqual(rows[1]["customer_name"], "Ada")
+
+    def test_jsonl_round_trip_keeps_values_as_entered(self):
+        records = [json.loads(line) for line in self.export("jsonl").splitlines()]
+        self.assertEqual([record["order_id"] for record in records], [order.pk for order in self.orders])
+        self.assertEqual(records[0]["phone"], "+2348000000000")
+        self.assertEqual(records[0]["items"], [{"product": "Hen", "quantity": 2, "price": "10.00"}])
+
+    def test_gzip_matches_the_plain_export(self):
+        self.assertEqual(self.export("jsonl", compress=True), self.export("jsonl"))
+
+    def test_one_lines_query_per_chunk(self):
+        # The orders query, then one lines query for each chunk of two.
+        with self.assertNumQueries(4):
+            records = list(export_records(Order.objects.all(), chunk_size=2))
+        self.assertEqual([record["item_count"] for record in records], [2] * 5)
+
+
+class SalesAnalyticsTests(TestCase):
+    def test_snapshot_summarises_by_period_and_ranks_products(self):
+        user = User.objects.create(username="analytics@example.com")
+        hen = Product.objects.create(name="Hen", category="Poultry", price=10, stock=99)
+        ram = Product.objects.create(name="Ram", category="Cattle", price=100, stock=9)
+        today = timezone.now()
+        placed = [
+            (today - timedelta(days=1), "completed", [(hen, 3)]),
+            (today, "completed", [(hen, 1), (ram, 1)]),
+            (today, "pending", [(ram, 5)]),
+        ]
+        for created_at, status, lines in placed:
+            order = Order.objects.create(user=user, status=status)
+            Order.objects.filter(pk=order.pk).update(created_at=created_at)
+            OrderItem.objects.bulk_create(
+                [
+                    OrderItem(order=order, product=product, quantity=quantity, price=product.price)
+                    for product, quantity in lines
+                ]
+            )
+
+        path = os.path.join(tempfile.mkdtemp(), "sales.npz")
+        snapshot = load_snapshot(build_snapshot(chunk_size=1, path=path))
+        rows = summarize(snapshot, "day")["rows"]
+        self.assertEqual(
+            [(row["revenue"], row["units"], row["orders"], row["basket_value"]) for row in rows],
+            [(30.0, 3, 1, 30.0), (110.0, 2, 1, 110.0)],
+        )
+        poultry = summarize(snapshot, "day")["categories"].index("Poultry")
+        self.assertEqual(rows[1]["mix"][poultry], 9.1)
+        self.assertEqual(top_products(snapshot), [(ram.pk, 1, 100.0), (hen.pk, 4, 40.0)])
+
+
+class PickListTests(TestCase):
+    def test_pick_list_is_one_grouped_query_without_cancelled_orders(self):
+        user = User.objects.create(username="picker@example.com")
+        hen = Product.objects.create(name="Hen", category="Poultry", price=10, stock=99)
+        orders = Order.objects.bulk_create(
+            [
+                Order(user=user, status=status, total_amount=20)
+                for status in ("pending", "completed", "cancelled", "pending")
+            ]
+        )
+        OrderItem.objects.bulk_create(
+            [OrderItem(order=order, product=hen, quantity=2, price=10) for order in orders]
+        )
+        with self.assertNumQueries(1):
+            rows = pick_list(orders_to_pick(timezone.localdate()))
+        self.assertEqual([(row["name"], row["quantity"], row["orders"]) for row in rows], [("Hen", 6, 3)])
@@ -0,0 +1,110 @@
+from django.db import transaction
+from django.db.models import F
+from .metrics import record_transitions
+from .models import Order, OrderStatusChange
+
+# Legal moves out of each status. Completed and cancelled are final; a
+# failed Paystack order can still complete when a late payment arrives, or
+# be put back to awaiting payment while staff chase the customer (its stock
+# is held again first, see reserve_stock_for_orders).
+ORDER_TRANSITIONS = {
+    "pending": ("awaiting_payment", "completed", "failed", "cancelled"),
+    "awaiting_payment": ("completed", "failed", "cancelled"),
+    "failed": ("awaiting_payment", "completed", "cancelled"),
+    "completed": (),
+    "cancelled": (),
+}
+
+
+def can_transition(from_status, to_status):
+    return to_status in ORDER_TRANSITIONS.get(from_status, ())
+
+
+def source_statuses(to_status):
+    """The statuses an order may move to ``to_status`` from."""
+    return [status for status, targets in ORDER_TRANSITIONS.items() if to_status in targets]
+
+
+def transition_order(order, to_status, source, changed_by=None, **fields):
+    """
+    Move one order to ``to_status`` if that is legal from its loaded status.
+
+    The change is a single conditional ``UPDATE ... WHERE id = %s AND
+    status = %s AND version = %s``, so when two callers race on the same
+    order only the first one wins and the other gets ``False`` instead of
+    overwriting it. Extra ``fields`` are written in the same statement.
+    Returns whether this call moved the order; on success ``order`` is
+    updated in place and the dashboard rollups are adjusted.
+    """
+    from_status = order.status
+    if not can_transition(from_status, to_status):
+        return False
+    with transaction.atomic(savepoint=False):
+        updated = Order.objects.filter(
+            pk=order.pk,
+            status=from_status,
+            version=order.version,
+        ).update(status=to_status, version=F("version") + 1, **fields)
+        if not updated:
+            return False
+        OrderStatusChange.objects.create(
+            order=order,
+            from_status=from_status,
+            to_status=to_status,
+            version=order.version + 1,
+            source=source,
+            changed_by=changed_by,
+        )
+        record_transitions(
+            [(order.pk, from_status, order.created_at, order.total_amount)],
+            to_status,
+        )
+    order.status = to_status
+    order.version += 1
+    for name, value in fields.items():
+        setattr(order, name, value)
+    return True
+
+
+def transition_orders(order_ids, to_status, source, changed_by=None, **fields):
+    """
+    Move every listed order that may legally go to ``to_status``.
+
+    Rows are locked and read once, moved with one UPDATE and their history
+    written with one insert, whatever the number of orders. Orders already
+    past the point of no return are skipped. Returns the ids that moved.
+    """
+    sources = source_statuses(to_status)
+    with transaction.atomic(savepoint=False):
+        rows = list(
+            Order.objects.select_for_update()
+            .filter(pk__in=order_ids, status__in=sources)
+            .order_by("pk")
+            .values_list("pk", "status", "version", "created_at", "total_amount")
+        )
+        if not rows:
+            return []
+        moved = [row[0] for row in rows]
+        Order.objects.filter(pk__in=moved).update(
+            status=to_status,
+            version=F("version") + 1,
+            **fields,
+        )
+        OrderStatusChange.objects.bulk_create(
+            [
+                OrderStatusChange(
+                    order_id=pk,
+                    from_status=status,
+                    to_status=to_status,
+                    version=version + 1,
+                    source=source,
+                    changed_by=changed_by,
+                )
+                for pk, status, version, _, _ in rows
+            ]
+        )
+        record_transitions(
+            [(pk, status, created_at, total) for pk, status, _, created_at, total in rows],
+            to_status,
+        )
+    return moved
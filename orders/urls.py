@@ -6,6 +6,7 @@ app_name = "orders"
 urlpatterns = [
     path("cart/", views.cart_view, name="cart"),
     path("cart/add/<int:product_id>/", views.add_to_cart, name="add_to_cart"),
+    path("cart/update/", views.update_cart_batch, name="update_cart_batch"),
     path("cart/update/<int:product_id>/", views.update_cart, name="update_cart"),
     path("cart/remove/<int:product_id>/", views.remove_from_cart, name="remove_from_cart"),
     path("checkout/", views.checkout, name="checkout"),
@@ -4,60 +4,32 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.urls import reverse
 from django.utils import timezone
-from django.core.mail import send_mail
+from core.outbox import queue_mail
+from core.utils import parse_int
 from products.models import Product
-from .models import Order, OrderItem
-import uuid
+from .cart import (
+    cart_snapshot,
+    clear_cart,
+    get_cart,
+    remove_item,
+    set_quantities,
+    set_quantity,
+)
+from .checkout import place_order
+from .models import Order, PaystackWebhookEvent
+from .paystack import flag_unpayable_payment, paystack, payment_mismatch
+from .reservations import InsufficientStock, available_stock, release_reservations
+from .stock import deduct_stock
+from .transitions import transition_order
 import hmac
 import json
 import hashlib
 import requests
 
 
-def _get_cart(session):
-    return session.setdefault("cart", {})
-
-
-def _cart_totals(cart):
-    product_ids = [int(pid) for pid in cart.keys()]
-    products = Product.objects.filter(id__in=product_ids)
-    items = []
-    total = Decimal("0.00")
-    for product in products:
-        quantity = int(cart.get(str(product.id), 0))
-        line_total = product.price * quantity
-        total += line_total
-        items.append(
-            {
-                "product": product,
-                "quantity": quantity,
-                "line_total": line_total,
-            }
-        )
-    return items, total
-
-
-def _deduct_stock(order):
-    if order.stock_deducted:
-        return
-    for item in order.items.select_related("product"):
-        product = item.product
-        product.stock = max(product.stock - item.quantity, 0)
-        product.save(update_fields=["stock"])
-    order.stock_deducted = True
-    order.save(update_fields=["stock_deducted"])
-
-
-def _parse_int(value):
-    try:
-        return int(value)
-    except (TypeError, ValueError):
-        return None
-
-
 def _reject_staff(request):
     if request.user.is_authenticated and request.user.is_staff:
         messages.error(request, "Admins cannot access customer pages.")
@@ -65,16 +37,18 @@ def _reject_staff(request):
     return None
 
 
-def _order_items_summary(order):
+def _order_items_summary(order, order_items=None):
+    if order_items is None:
+        order_items = order.items.select_related("product")
     lines = []
-    for item in order.items.select_related("product"):
+    for item in order_items:
         lines.append(f"- {item.product.name} x{item.quantity} @ ₦{item.price}")
     return "\n".join(lines) if lines else "- None"
 
 
-def _send_order_notifications(order):
+def _send_order_notifications(order, order_items=None):
     subject = f"JJ Halal Farms Order #{order.id}"
-    items_text = _order_items_summary(order)
+    items_text = _order_items_summary(order, order_items)
     customer_name = order.full_name or order.user.get_full_name() or order.user.username
     customer_email = order.user.email
     admin_email = getattr(settings, "ADMIN_EMAIL", "") or settings.DEFAULT_FROM_EMAIL
@@ -93,20 +67,18 @@ def _send_order_notifications(order):
     )
 
     if customer_email:
-        send_mail(
+        queue_mail(
             subject,
             body,
             settings.DEFAULT_FROM_EMAIL,
             [customer_email],
-            fail_silently=True,
         )
     if admin_email:
-        send_mail(
+        queue_mail(
             f"[Admin] {subject}",
             body,
             settings.DEFAULT_FROM_EMAIL,
             [admin_email],
-            fail_silently=True,
         )
 
 
@@ -114,9 +86,12 @@ def cart_view(request):
     staff_redirect = _reject_staff(request)
     if staff_redirect:
         return staff_redirect
-    cart = _get_cart(request.session)
-    items, total = _cart_totals(cart)
-    return render(request, "user/cart.html", {"items": items, "total": total})
+    snapshot = cart_snapshot(request)
+    return render(
+        request,
+        "user/cart.html",
+        {"items": snapshot.items, "total": snapshot.total},
+    )
 
 
 def add_to_cart(request, product_id):
@@ -124,17 +99,17 @@ def add_to_cart(request, product_id):
     if staff_redirect:
         return staff_redirect
     product = get_object_or_404(Product, pk=product_id)
-    cart = _get_cart(request.session)
     quantity = int(request.POST.get("quantity", 1))
-    if product.stock <= 0:
+    available = available_stock([product])[product.id]
+    if available <= 0:
         messages.error(request, f"{product.name} is out of stock.")
         return redirect(request.META.get("HTTP_REFERER", "orders:cart"))
-    current = cart.get(str(product.id), 0)
-    new_qty = min(current + max(quantity, 1), product.stock)
-    cart[str(product.id)] = new_qty
+    cart = get_cart(request, create=True)
+    current = cart.items.filter(product=product).values_list("quantity", flat=True).first() or 0
+    new_qty = min(current + max(quantity, 1), available)
+    set_quantity(cart, product.id, new_qty)
     if new_qty != current + max(quantity, 1):
-        messages.info(request, f"Only {product.stock} units available for {product.name}.")
-    request.session.modified = True
+        messages.info(request, f"Only {available} units available for {product.name}.")
     messages.success(request, f"{product.name} added to cart.")
     return redirect(request.META.get("HTTP_REFERER", "orders:cart"))
 
@@ -143,28 +118,93 @@ def update_cart(request, product_id):
     staff_redirect = _reject_staff(request)
     if staff_redirect:
         return staff_redirect
-    cart = _get_cart(request.session)
+    cart = get_cart(request)
+    if cart is None:
+        return redirect("orders:cart")
     quantity = int(request.POST.get("quantity", 1))
     if quantity <= 0:
-        cart.pop(str(product_id), None)
+        remove_item(cart, product_id)
     else:
         product = get_object_or_404(Product, pk=product_id)
-        if product.stock <= 0:
-            cart.pop(str(product_id), None)
+        available = available_stock([product])[product.id]
+        if available <= 0:
+            remove_item(cart, product_id)
             messages.error(request, f"{product.name} is out of stock.")
         else:
-            cart[str(product_id)] = min(quantity, product.stock)
-    request.session.modified = True
+            set_quantity(cart, product_id, min(quantity, available))
     return redirect("orders:cart")
 
 
+def update_cart_batch(request):
+    staff_redirect = _reject_staff(request)
+    if staff_redirect:
+        return staff_redirect
+    wants_json = "application/json" in request.headers.get("Accept", "")
+    if request.method != "POST":
+        return redirect("orders:cart")
+
+    requested = {}
+    for key, value in request.POST.items():
+        if not key.startswith("quantity_"):
+            continue
+        product_id = parse_int(key[len("quantity_"):])
+        quantity = parse_int(value)
+        if product_id is not None and quantity is not None:
+            requested[product_id] = quantity
+
+    notices = []
+    cart = get_cart(request)
+    if cart is not None and requested:
+        products = list(Product.objects.filter(id__in=requested.keys()).only("name", "stock"))
+        by_id = {product.id: product for product in products}
+        available = available_stock(products)
+        lines = {}
+        for product_id, quantity in requested.items():
+            product = by_id.get(product_id)
+            if product is None or quantity <= 0:
+                lines[product_id] = 0
+            elif available[product_id] <= 0:
+                lines[product_id] = 0
+                notices.append(f"{product.name} is out of stock.")
+            elif quantity > available[product_id]:
+                lines[product_id] = available[product_id]
+                notices.append(
+                    f"Only {available[product_id]} units available for {product.name}."
+                )
+            else:
+                lines[product_id] = quantity
+        set_quantities(cart, lines)
+
+    if not wants_json:
+        for notice in notices:
+            messages.info(request, notice)
+        return redirect("orders:cart")
+
+    snapshot = cart_snapshot(request)
+    return JsonResponse(
+        {
+            "items": [
+                {
+                    "product_id": item["product"].id,
+                    "quantity": item["quantity"],
+                    "line_total": item["line_total"],
+                }
+                for item in snapshot.items
+            ],
+            "total": snapshot.total,
+            "cart_count": snapshot.count,
+            "messages": notices,
+        }
+    )
+
+
 def remove_from_cart(request, product_id):
     staff_redirect = _reject_staff(request)
     if staff_redirect:
         return staff_redirect
-    cart = _get_cart(request.session)
-    cart.pop(str(product_id), None)
-    request.session.modified = True
+    cart = get_cart(request)
+    if cart is not None:
+        remove_item(cart, product_id)
     return redirect("orders:cart")
 
 
@@ -173,15 +213,15 @@ def checkout(request):
     staff_redirect = _reject_staff(request)
     if staff_redirect:
         return staff_redirect
-    cart = _get_cart(request.session)
-    items, total = _cart_totals(cart)
+    snapshot = cart_snapshot(request)
+    cart, items, total = snapshot.cart, snapshot.items, snapshot.total
     if not items:
         messages.error(request, "Your cart is empty.")
         return redirect("orders:cart")
+    available = available_stock([item["product"] for item in items])
     for item in items:
-        if item["quantity"] > item["product"].stock:
-            cart[str(item["product"].id)] = item["product"].stock
-            request.session.modified = True
+        if item["quantity"] > available[item["product"].id]:
+            set_quantity(cart, item["product"].id, available[item["product"].id])
             messages.error(
                 request,
                 f"{item['product'].name} stock reduced. Please review your cart.",
@@ -197,40 +237,25 @@ def checkout(request):
             messages.error(request, "Pay on delivery is only available for farm pickup.")
             return redirect("orders:checkout")
 
-        reference = uuid.uuid4().hex
-        full_name = request.user.get_full_name().strip()
-        if not full_name:
-            full_name = request.user.first_name.strip()
-        if not full_name:
-            full_name = request.user.email or request.user.username
-        phone = ""
-        if hasattr(request.user, "customerprofile"):
-            phone = request.user.customerprofile.phone
-
-        order = Order.objects.create(
-            user=request.user,
-            full_name=full_name,
-            phone=phone,
-            delivery_method=delivery_method,
-            payment_method=payment_method,
-            delivery_address=delivery_address,
-            total_amount=total,
-            status="awaiting_payment" if payment_method == "pay_on_delivery" else "pending",
-            payment_reference=reference,
-        )
-
-        for item in items:
-            OrderItem.objects.create(
-                order=order,
-                product=item["product"],
-                quantity=item["quantity"],
-                price=item["product"].price,
+        try:
+            order, order_items = place_order(
+                request.user,
+                items,
+                total,
+                delivery_method,
+                payment_method,
+                delivery_address,
             )
+        except InsufficientStock as exc:
+            for line in exc.shortfalls:
+                set_quantity(cart, line["product"].id, line["available"])
+            messages.error(request, f"{exc}. Please review your cart.")
+            return redirect("orders:cart")
+        reference = order.payment_reference
 
-        _send_order_notifications(order)
+        _send_order_notifications(order, order_items)
 
-        request.session["cart"] = {}
-        request.session.modified = True
+        clear_cart(cart)
 
         if payment_method == "pay_on_delivery":
             messages.success(request, "Order placed. Please pay on pickup.")
@@ -254,15 +279,8 @@ def checkout(request):
                 "user_id": request.user.id,
             },
         }
-        headers = {"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"}
         try:
-            response = requests.post(
-                "https://api.paystack.co/transaction/initialize",
-                json=payload,
-                headers=headers,
-                timeout=20,
-            )
-            data = response.json()
+            data = paystack.initialize_transaction(payload)
         except requests.RequestException:
             messages.error(request, "Payment service is unreachable. Please try again.")
             return redirect("orders:cart")
@@ -293,14 +311,8 @@ def paystack_verify(request):
         messages.error(request, "Missing payment reference.")
         return redirect("orders:payment_failed")
 
-    headers = {"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"}
     try:
-        response = requests.get(
-            f"https://api.paystack.co/transaction/verify/{reference}",
-            headers=headers,
-            timeout=20,
-        )
-        data = response.json()
+        data = paystack.verify_transaction(reference)
     except requests.RequestException:
         messages.error(request, "Payment verification failed. Please try again.")
         return redirect("orders:payment_failed")
@@ -320,34 +332,37 @@ def paystack_verify(request):
             messages.error(request, "Payment method mismatch.")
             return redirect("orders:payment_failed")
 
-        if paystack_data.get("amount") != int(order.total_amount * Decimal("100")):
-            order.status = "failed"
-            order.save(update_fields=["status"])
-            messages.error(request, "Payment amount mismatch.")
-            return redirect("orders:payment_failed")
-        metadata = paystack_data.get("metadata", {})
-        meta_order_id = _parse_int(metadata.get("order_id"))
-        meta_user_id = _parse_int(metadata.get("user_id"))
-        if meta_order_id != order.id or meta_user_id != order.user_id:
-            order.status = "failed"
-            order.save(update_fields=["status"])
-            messages.error(request, "Payment metadata mismatch.")
+        mismatch = payment_mismatch(order, paystack_data)
+        if mismatch:
+            if transition_order(order, "failed", source="paystack_verify"):
+                release_reservations([order.pk])
+            messages.error(request, mismatch)
             return redirect("orders:payment_failed")
 
-        order.status = "completed"
-        order.payment_verified_at = timezone.now()
-        order.save(update_fields=["status", "payment_verified_at"])
-        _deduct_stock(order)
-        request.session["cart"] = {}
-        request.session.modified = True
+        if transition_order(
+            order,
+            "completed",
+            source="paystack_verify",
+            payment_verified_at=timezone.now(),
+        ):
+            deduct_stock(order)
+        elif order.status != "completed":
+            # The webhook may have completed it between our read and write.
+            order.refresh_from_db(fields=["status"])
+        if order.status != "completed":
+            flag_unpayable_payment(order, "paystack_verify")
+            messages.error(
+                request,
+                "This order can no longer be paid. Your payment has been flagged "
+                "for review and the shop will contact you.",
+            )
+            return redirect("orders:payment_failed")
+        clear_cart(get_cart(request))
         return redirect("orders:payment_success")
 
-    try:
-        order = Order.objects.get(payment_reference=reference, user=request.user)
-        order.status = "failed"
-        order.save(update_fields=["status"])
-    except Order.DoesNotExist:
-        pass
+    order = Order.objects.filter(payment_reference=reference, user=request.user).first()
+    if order is not None and transition_order(order, "failed", source="paystack_verify"):
+        release_reservations([order.pk])
 
     messages.error(request, "Payment was not successful.")
     return redirect("orders:payment_failed")
@@ -373,31 +388,16 @@ def paystack_webhook(request):
         return HttpResponse(status=400)
 
     event = payload.get("event")
-    data = payload.get("data", {})
+    data = payload.get("data") or {}
     reference = data.get("reference")
 
-    if event == "charge.success" and reference:
-        try:
-            order = Order.objects.get(payment_reference=reference)
-        except Order.DoesNotExist:
-            return HttpResponse(status=404)
-
-        if order.payment_method != "paystack":
-            return HttpResponse(status=400)
-
-        if data.get("amount") != int(order.total_amount * Decimal("100")):
-            return HttpResponse(status=400)
-        metadata = data.get("metadata", {})
-        meta_order_id = _parse_int(metadata.get("order_id"))
-        meta_user_id = _parse_int(metadata.get("user_id"))
-        if meta_order_id != order.id or meta_user_id != order.user_id:
-            return HttpResponse(status=400)
-
-        if order.status != "completed":
-            order.status = "completed"
-            order.payment_verified_at = timezone.now()
-            order.save(update_fields=["status", "payment_verified_at"])
-            _deduct_stock(order)
+    # Processing happens in `manage.py process_webhook_events`; the unique
+    # (reference, event) constraint drops Paystack's retries and duplicates.
+    if event and reference:
+        PaystackWebhookEvent.objects.bulk_create(
+            [PaystackWebhookEvent(reference=reference, event=event, payload=payload)],
+            ignore_conflicts=True,
+        )
 
     return HttpResponse(status=200)
 
@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.utils import timezone
+from .models import Order, PaystackWebhookEvent
+from .paystack import flag_unpayable_payment, payment_mismatch
+from .stock import deduct_stock_for_orders
+from .transitions import transition_orders
+
+
+def process_webhook_events(batch_size=200):
+    """
+    Apply one batch of stored Paystack webhook events.
+
+    Every order referenced by the batch is loaded with a single query and
+    the orders that are now paid are completed through ``transition_orders``.
+    Payments for orders that can no longer complete (cancelled ones) are
+    rejected and logged for manual review.
+    Returns the number of events handled.
+    """
+    with transaction.atomic():
+        events = list(
+            PaystackWebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(status="pending")
+            .order_by("received_at", "id")[:batch_size]
+        )
+        if not events:
+            return 0
+
+        references = {event.reference for event in events}
+        orders = {
+            order.payment_reference: order
+            for order in Order.objects.filter(payment_reference__in=references)
+        }
+
+        orders_by_id = {order.pk: order for order in orders.values()}
+        now = timezone.now()
+        paid = {}
+        for event in events:
+            event.processed_at = now
+            order = orders.get(event.reference)
+            if event.event != "charge.success":
+                event.status = "ignored"
+            elif order is None:
+                event.status = "ignored"
+                event.error = "Order not found."
+            elif order.payment_method != "paystack":
+                event.status = "rejected"
+                event.error = "Payment method mismatch."
+            else:
+                mismatch = payment_mismatch(order, event.payload.get("data") or {})
+                if mismatch:
+                    event.status = "rejected"
+                    event.error = mismatch
+                else:
+                    event.status = "processed"
+                    if order.status != "completed":
+                        paid.setdefault(order.pk, []).append(event)
+
+        if paid:
+            completed = transition_orders(
+                paid.keys(),
+                "completed",
+                source="paystack_webhook",
+                payment_verified_at=now,
+            )
+            deduct_stock_for_orders(completed)
+            skipped = paid.keys() - set(completed)
+            if skipped:
+                current = Order.objects.filter(pk__in=skipped).exclude(status="completed")
+                for order_id, status in current.values_list("pk", "status"):
+                    # Paid after it was cancelled: the money was taken but the
+                    # order cannot complete, so leave it for staff to review.
+                    order = orders_by_id[order_id]
+                    order.status = status
+                    error = flag_unpayable_payment(order, "paystack_webhook")
+                    for event in paid[order_id]:
+                        event.status = "rejected"
+                        event.error = error
+
+        PaystackWebhookEvent.objects.bulk_update(
+            events,
+            ["status", "error", "processed_at"],
+        )
+    return len(events)
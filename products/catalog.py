@@ -0,0 +1,114 @@
+import time
+from urllib.parse import urlencode
+from django.core.cache import cache
+from django.db import transaction
+from core.pagination import keyset_page
+from .models import Product
+
+CATALOG_VERSION_KEY = "catalog:version"
+ADMIN_PRODUCTS_PER_PAGE = 25
+
+# Each sort ends on the primary key so the keyset cursor is unique, and has
+# an index of its own and one prefixed by category (see Product.Meta), so a
+# page reads per_page rows whatever the filter and catalog size.
+PRODUCT_SORTS = {
+    "newest": ("-created_at", "-id"),
+    "price": ("price", "id"),
+    "-price": ("-price", "-id"),
+    "name": ("name", "id"),
+}
+PRODUCT_SORT_LABELS = (
+    ("newest", "Newest"),
+    ("price", "Price: low to high"),
+    ("-price", "Price: high to low"),
+    ("name", "Name"),
+)
+
+
+def catalog_version():
+    """The current catalog version, part of every cached catalog fragment's key."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Start from the clock so a lost key never brings old fragments back.
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, time.time_ns(), None)
+
+
+def catalog_changed():
+    """
+    Retire the cached catalog fragments once the current transaction commits.
+
+    Bumping after the commit keeps a concurrent page view from caching the
+    old rows under the new version.
+    """
+    transaction.on_commit(bump_catalog_version)
+
+
+def catalog_cache_key(name):
+    return f"catalog:{name}:{catalog_version()}"
+
+
+def catalog_filters(params):
+    """The category and sort from ``params``; unknown values fall back to the defaults."""
+    filters = {"category": params.get("category", ""), "sort": params.get("sort", "")}
+    if filters["category"] not in dict(Product.CATEGORY_CHOICES):
+        filters["category"] = ""
+    if filters["sort"] not in PRODUCT_SORTS:
+        filters["sort"] = "newest"
+    return filters
+
+
+def product_page(queryset, params, per_page):
+    """
+    One cursor page of ``queryset`` filtered by category and sorted from ``params``.
+
+    Returns ``(page, filters)``; unknown categories and sorts are ignored.
+    ``queryset`` should already be narrowed with ``.only()`` to what the
+    template shows plus ``created_at`` for the cursor.
+    """
+    filters = catalog_filters(params)
+    if filters["category"]:
+        queryset = queryset.filter(category=filters["category"])
+    page = keyset_page(
+        queryset,
+        PRODUCT_SORTS[filters["sort"]],
+        per_page,
+        after=params.get("after"),
+        before=params.get("before"),
+    )
+    return page, filters
+
+
+def page_links(filters, page):
+    """Query strings for the previous and next pages, keeping the filters."""
+    base = {name: value for name, value in filters.items() if value and value != "newest"}
+
+    def query(**cursor):
+        return urlencode({**base, **cursor})
+
+    return (
+        query(before=page.previous_cursor) if page.has_previous else "",
+        query(after=page.next_cursor) if page.has_next else "",
+    )
+
+
+def catalog_context(queryset, params, per_page):
+    """Template context for one filtered, sorted page of products."""
+    page, filters = product_page(queryset, params, per_page)
+    previous_query, next_query = page_links(filters, page)
+    return {
+        "products": page,
+        "filters": filters,
+        "categories": Product.CATEGORY_CHOICES,
+        "sorts": PRODUCT_SORT_LABELS,
+        "previous_query": previous_query,
+        "next_query": next_query,
+    }
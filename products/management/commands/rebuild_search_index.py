@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from products.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every product's search vector, e.g. after bulk imports "
+        "that bypassed Product.save (PostgreSQL only)."
+    )
+
+    def handle(self, *args, **options):
+        updated = update_search_vectors()
+        self.stdout.write(self.style.SUCCESS(f"Updated the search vector of {updated} product(s)."))
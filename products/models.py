@@ -1,4 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from core.storage import content_storage
 
 class Product(models.Model):
 
@@ -13,9 +16,26 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField()
     description = models.TextField(blank=True)
-    image = models.ImageField(upload_to='products/', blank=True, null=True)
+    image = models.ImageField(upload_to='products/', storage=content_storage, blank=True, null=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # Weighted name/category/description vector, kept by products.search.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Newest-first catalog pages, within a category and overall.
+            models.Index(fields=["category", "-created_at", "-id"], name="product_category_created_idx"),
+            models.Index(fields=["-created_at", "-id"], name="product_created_idx"),
+            # Price and name sorts, alone and per category; read backwards for -price.
+            models.Index(fields=["category", "price", "id"], name="product_category_price_idx"),
+            models.Index(fields=["price", "id"], name="product_price_idx"),
+            models.Index(fields=["category", "name", "id"], name="product_category_name_idx"),
+            models.Index(fields=["name", "id"], name="product_name_idx"),
+            # Full-text and typo-tolerant search (PostgreSQL only).
+            GinIndex(fields=["search_vector"], name="product_search_idx"),
+            GinIndex(fields=["name"], opclasses=["gin_trgm_ops"], name="product_name_trgm_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -0,0 +1,156 @@
+"""
+Ranked product search over name, category and description.
+
+On PostgreSQL each product carries a weighted ``tsvector`` (name A,
+category B, description C) refreshed on save and searched through a GIN
+index; a trigram index on the name catches typos. Other databases (the
+SQLite test setups) get an inverted index built in memory from the same
+fields and rebuilt whenever the catalog version changes.
+"""
+import math
+import re
+from collections import defaultdict
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Q
+from .catalog import catalog_version
+from .models import Product
+
+SEARCH_CONFIG = "english"
+# pg_trgm's default similarity threshold, used by the fallback as well.
+SIMILARITY_THRESHOLD = 0.3
+FIELD_WEIGHTS = (("name", "A", 1.0), ("category", "B", 0.4), ("description", "C", 0.2))
+
+_TOKEN = re.compile(r"\w+")
+_index = {"version": None, "index": None}
+
+
+def search_vector():
+    vector = None
+    for field, weight, _ in FIELD_WEIGHTS:
+        part = SearchVector(field, weight=weight, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def update_search_vectors(product_ids=None):
+    """Recompute the stored vectors (PostgreSQL only); returns the rows updated."""
+    products = Product.objects.all()
+    if connections[products.db].vendor != "postgresql":
+        return 0
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    return products.update(search_vector=search_vector())
+
+
+def _terms(text):
+    """Lower-cased words with a plural ``s`` dropped, close to what the stemmer keeps."""
+    terms = []
+    for word in _TOKEN.findall(text.lower()):
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def _trigrams(word):
+    padded = f"  {word} "
+    return {padded[position:position + 3] for position in range(len(padded) - 2)}
+
+
+class InvertedIndex:
+    """Term -> {product id: weight} postings with a trigram map for near misses."""
+
+    def __init__(self, rows):
+        self.postings = defaultdict(lambda: defaultdict(float))
+        self.size = 0
+        for row in rows:
+            self.size += 1
+            for (_, _, weight), text in zip(FIELD_WEIGHTS, row[1:]):
+                for term in _terms(text or ""):
+                    self.postings[term][row[0]] += weight
+        self.by_trigram = defaultdict(set)
+        for term in self.postings:
+            for trigram in _trigrams(term):
+                self.by_trigram[trigram].add(term)
+
+    def similar_terms(self, term):
+        """Indexed terms whose trigram similarity to ``term`` meets the threshold."""
+        wanted = _trigrams(term)
+        shared = defaultdict(int)
+        for trigram in wanted:
+            for candidate in self.by_trigram.get(trigram, ()):
+                shared[candidate] += 1
+        similar = []
+        for candidate, count in shared.items():
+            similarity = count / (len(wanted) + len(_trigrams(candidate)) - count)
+            if similarity >= SIMILARITY_THRESHOLD:
+                similar.append((candidate, similarity))
+        return similar
+
+    def search(self, query):
+        """Product ids matching every query term (or a near miss of it), best first."""
+        scores = None
+        for term in dict.fromkeys(_terms(query)):
+            matches = [(term, 1.0)] if term in self.postings else self.similar_terms(term)
+            term_scores = defaultdict(float)
+            for match, similarity in matches:
+                postings = self.postings[match]
+                idf = math.log(1 + self.size / len(postings))
+                for product_id, weight in postings.items():
+                    term_scores[product_id] = max(
+                        term_scores[product_id], weight * idf * similarity
+                    )
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {pk: scores[pk] + term_scores[pk] for pk in scores if pk in term_scores}
+            if not scores:
+                return []
+        return sorted(scores or (), key=lambda pk: (-scores[pk], -pk))
+
+
+def _memory_index():
+    version = catalog_version()
+    if _index["index"] is None or _index["version"] != version:
+        rows = Product.objects.values_list("pk", *(field for field, _, _ in FIELD_WEIGHTS))
+        _index["index"] = InvertedIndex(rows.iterator(chunk_size=2000))
+        _index["version"] = version
+    return _index["index"]
+
+
+def search_products(query, page_number=1, per_page=12, queryset=None):
+    """
+    A ``Page`` of products matching ``query``, best match first.
+
+    ``queryset`` sets the columns loaded for the page (``.only()`` and
+    annotations); on PostgreSQL the page is read in one ranked query over
+    the GIN indexes, elsewhere the in-memory index ranks the ids and one
+    ``in_bulk`` query loads the page.
+    """
+    queryset = Product.objects.all() if queryset is None else queryset
+    query = query.strip()
+    if not query:
+        return Paginator([], per_page).get_page(1)
+    if connections[queryset.db].vendor == "postgresql":
+        search_query = SearchQuery(query, search_type="websearch", config=SEARCH_CONFIG)
+        results = (
+            queryset.annotate(
+                rank=SearchRank(F("search_vector"), search_query),
+                similarity=TrigramSimilarity("name", query),
+            )
+            .filter(Q(search_vector=search_query) | Q(name__trigram_similar=query))
+            .order_by("-rank", "-similarity", "-id")
+        )
+        return Paginator(results, per_page).get_page(page_number)
+
+    page = Paginator(_memory_index().search(query), per_page).get_page(page_number)
+    products = queryset.in_bulk(page.object_list)
+    page.object_list = [products[pk] for pk in page.object_list if pk in products]
+    return page
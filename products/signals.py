@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .catalog import catalog_changed
+from .models import Product
+from .search import FIELD_WEIGHTS, update_search_vectors
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, **kwargs):
+    catalog_changed()
+
+
+@receiver(post_save, sender=Product)
+def refresh_search_vector(sender, instance, update_fields=None, **kwargs):
+    searched = {field for field, _, _ in FIELD_WEIGHTS}
+    if update_fields is None or searched & set(update_fields):
+        update_search_vectors([instance.pk])
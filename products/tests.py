@@ -1,3 +1,92 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from .catalog import PRODUCT_SORTS, product_page
+from .models import Product
+from .search import search_products
 
-# Create your tests here.
+
+class CatalogPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categories = [code for code, _ in Product.CATEGORY_CHOICES]
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name=f"Listing {index:04d}",
+                    category=categories[index % len(categories)],
+                    price=index + 1,
+                    stock=5,
+                    description="word " * 200,
+                )
+                for index in range(1500)
+            ]
+        )
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE products_product")
+
+    def test_category_page_uses_category_index(self):
+        plan = (
+            Product.objects.filter(category="Fish")
+            .order_by(*PRODUCT_SORTS["newest"])[:21]
+            .explain()
+        )
+        self.assertIn("product_category_created_idx", plan)
+
+    def test_every_sort_walks_an_index(self):
+        for sort, ordering in PRODUCT_SORTS.items():
+            for products in (Product.objects.all(), Product.objects.filter(category="Fish")):
+                with self.subTest(sort=sort, filtered=products.query.has_filters()):
+                    plan = products.order_by(*ordering)[:21].explain()
+                    self.assertIn("product_", plan)
+                    self.assertNotIn("TEMP B-TREE", plan)
+                    self.assertNotRegex(plan, r"\bSort\b")
+
+    def test_category_pages_cover_every_listing_once(self):
+        products = Product.objects.only("name", "category", "created_at")
+        params, seen = {"category": "Cattle", "sort": "-price"}, []
+        while True:
+            page, filters = product_page(products, params, 100)
+            self.assertEqual(filters, {"category": "Cattle", "sort": "-price"})
+            seen += [product.pk for product in page]
+            if not page.has_next:
+                break
+            params = dict(params, after=page.next_cursor)
+        expected = Product.objects.filter(category="Cattle").order_by("-price", "-id")
+        self.assertEqual(seen, list(expected.values_list("pk", flat=True)))
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(
+                name="Whole Broiler Chicken",
+                category="Poultry",
+                price=10,
+                stock=3,
+                description="Fresh farm chicken",
+            )
+            Product.objects.create(
+                name="Smoked Catfish",
+                category="Fish",
+                price=10,
+                stock=3,
+                description="Goes well with chicken pepper soup",
+            )
+
+    def names(self, query):
+        return [product.name for product in search_products(query)]
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.names("chicken"), ["Whole Broiler Chicken", "Smoked Catfish"])
+        self.assertEqual(self.names("catfish chicken"), ["Smoked Catfish"])
+
+    def test_typos_still_match(self):
+        self.assertEqual(self.names("catfsh"), ["Smoked Catfish"])
+
+    def test_new_products_are_searchable_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Tilapia", category="Fish", price=5, stock=1)
+        self.assertEqual(self.names("tilapia"), ["Tilapia"])
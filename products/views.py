@@ -1,10 +1,13 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from core.images import schedule_derivatives
+from products.catalog import ADMIN_PRODUCTS_PER_PAGE, bump_catalog_version, catalog_context
 from products.models import Product
 
 
 def product_list(request):
-    products = Product.objects.all()
-    return render(request, 'admin_panel/products.html', {'products': products})
+    products = Product.objects.only("name", "category", "price", "stock", "created_at")
+    context = catalog_context(products, request.GET, ADMIN_PRODUCTS_PER_PAGE)
+    return render(request, 'admin_panel/products.html', context)
 
 
 def add_product(request):
@@ -16,7 +19,7 @@ def add_product(request):
         description = request.POST.get('description')
         image = request.FILES.get('image')
 
-        Product.objects.create(
+        product = Product.objects.create(
             name=name,
             category=category,
             price=price,
@@ -24,6 +27,7 @@ def add_product(request):
             description=description,
             image=image
         )
+        schedule_derivatives(product.image, on_ready=bump_catalog_version)
         return redirect('products:list')
 
     return render(request, 'admin_panel/products.html')
@@ -37,10 +41,13 @@ def edit_product(request, pk):
         product.price = request.POST.get('price')
         product.stock = request.POST.get('stock')
         product.description = request.POST.get('description')
-        if 'image' in request.FILES:
+        new_image = 'image' in request.FILES
+        if new_image:
             product.image = request.FILES.get('image')
 
         product.save()
+        if new_image:
+            schedule_derivatives(product.image, on_ready=bump_catalog_version)
         return redirect('products:list')
     return render(request, 'admin_panel/edit_product.html', {'product': product})
 